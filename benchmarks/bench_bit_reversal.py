@@ -0,0 +1,69 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the bit-reversal reordering of state vectors.
+
+Reports the time to generate the bit-reversal permutation with the legacy string based
+implementation and the vectorized one, and the time to reorder a state with
+``reorder_state`` (transpose) and ``reorder_state2`` (gather with the cached permutation).
+
+Usage::
+
+    python benchmarks/bench_bit_reversal.py --wires 12 16 20
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from pennylane_pyquest import utils
+
+
+def legacy_reversed_indices(n):
+    total_len = len(bin(n)) - 2
+    return np.array([int(bin(i)[2:].zfill(total_len)[::-1], 2) for i in range(n + 1)])
+
+
+def vectorized_reversed_indices(n):
+    utils._BIT_REVERSAL_CACHE.clear()
+    return utils.reversed_indices(n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, nargs="+", default=[10, 14, 18])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-limit", type=int, default=20, help="largest register for the legacy generator")
+    args = parser.parse_args()
+
+    print("{:>6} {:>24} {:>12}".format("wires", "method", "time [ms]"))
+
+    for wires in args.wires:
+        n = 2 ** wires - 1
+        state = np.random.default_rng(0).normal(size=2 ** wires) + 0j
+
+        methods = {
+            "permutation (vectorized)": lambda: vectorized_reversed_indices(n),
+            "reorder_state": lambda: utils.reorder_state(state),
+            "reorder_state2": lambda: utils.reorder_state2(state),
+        }
+        if wires <= args.legacy_limit:
+            methods["permutation (legacy)"] = lambda: legacy_reversed_indices(n)
+
+        for label, method in methods.items():
+            best = min(timeit.repeat(method, number=1, repeat=args.repeat))
+            print("{:>6} {:>24} {:>12.3f}".format(wires, label, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
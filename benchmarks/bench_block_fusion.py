@@ -0,0 +1,73 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the block fusion across circuit depths.
+
+A brickwork circuit of single-qubit rotations and CNOT/CZ gates on alternating pairs of
+wires is applied without fusion and with blocks of a maximal width of 2, 3 and 4 wires. For
+every depth the number of kernel calls, i.e. sweeps over the register, and the time per
+execution are reported.
+
+Usage::
+
+    python benchmarks/bench_block_fusion.py --wires 16 --depths 2 8 32
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pennylane as qml
+
+from pennylane_pyquest import PyquestPure
+
+WIDTHS = [None, 2, 3, 4]
+
+
+def brickwork(wires, depth, seed=42):
+    rng = np.random.default_rng(seed)
+    operations = []
+
+    for layer in range(depth):
+        for wire in range(wires):
+            operations.append(qml.RY(rng.uniform(0, 2 * np.pi), wires=wire))
+            operations.append(qml.RZ(rng.uniform(0, 2 * np.pi), wires=wire))
+
+        for wire in range(layer % 2, wires - 1, 2):
+            entangler = qml.CNOT if layer % 4 < 2 else qml.CZ
+            operations.append(entangler(wires=[wire, wire + 1]))
+
+    return operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, default=12)
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4, 8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>6} {:>6} {:>8} {:>12}".format("depth", "width", "sweeps", "time [ms]"))
+
+    for depth in args.depths:
+        operations = brickwork(args.wires, depth)
+
+        for width in WIDTHS:
+            with PyquestPure(wires=args.wires, max_fused_width=width) as dev:
+                sweeps = len(dev._preprocess_operations(operations))
+                best = min(timeit.repeat(lambda: dev.apply(operations), number=1, repeat=args.repeat))
+
+            print("{:>6} {:>6} {:>8} {:>12.3f}".format(depth, width or "-", sweeps, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
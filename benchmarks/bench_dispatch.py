@@ -0,0 +1,98 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Micro-benchmark of the per-gate dispatch overhead of the device.
+
+A random circuit is applied to a small register, once through the legacy dispatch that
+builds a new pyquest-cffi kernel for every gate and once through ``_OPERATIONS``.
+
+Usage::
+
+    python benchmarks/bench_dispatch.py --wires 4 --gates 10000
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pennylane as qml
+import pyquest_cffi as pqc
+
+from pennylane_pyquest import quest_env
+from pennylane_pyquest.pyquest_operation import _OPERATIONS
+
+_LEGACY = {
+    "Hadamard": lambda op, qureg: pqc.ops.hadamard()(qureg=qureg, qubit=op.wires.toarray()[0]),
+    "RX": lambda op, qureg: pqc.ops.rotateX()(
+        qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0]
+    ),
+    "RZ": lambda op, qureg: pqc.ops.rotateZ()(
+        qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0]
+    ),
+    "CNOT": lambda op, qureg: pqc.ops.controlledNot()(
+        qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1]
+    ),
+    "CRY": lambda op, qureg: pqc.ops.controlledRotateY()(
+        qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], theta=op.parameters[0],
+    ),
+}
+
+
+def random_circuit(wires, gates, seed=42):
+    rng = np.random.default_rng(seed)
+    operations = []
+
+    for _ in range(gates):
+        name = rng.choice(list(_LEGACY))
+        op_class = getattr(qml, name)
+        targets = [int(w) for w in rng.choice(wires, size=op_class.num_wires, replace=False)]
+        params = rng.uniform(0, 2 * np.pi, size=op_class.num_params)
+        operations.append(op_class(*params, wires=targets))
+
+    return operations
+
+
+def legacy_dispatch(operations, qureg):
+    for operation in operations:
+        _LEGACY[operation.name](operation, qureg)
+
+
+def table_dispatch(operations, qureg):
+    for operation in operations:
+        _OPERATIONS[operation.name].apply(operation, qureg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, default=4)
+    parser.add_argument("--gates", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    operations = random_circuit(args.wires, args.gates)
+
+    quest_env.acquire_env()
+    qureg = quest_env.create_qureg(args.wires)
+
+    try:
+        for label, dispatch in [("legacy", legacy_dispatch), ("table", table_dispatch)]:
+            best = min(
+                timeit.repeat(lambda: dispatch(operations, qureg), number=1, repeat=args.repeat)
+            )
+            print("{:>8}: {:8.3f} us/gate".format(label, 1e6 * best / args.gates))
+    finally:
+        quest_env.destroy_qureg(qureg)
+        quest_env.release_env()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the circuit passes of the devices.
+
+A hardware-efficient ansatz of decomposed ``Rot`` layers and CNOT ladders, or a QAOA circuit
+with ``MultiRZ`` cost layers on a random graph, is applied with different passes enabled. For
+every configuration the number of kernel calls, i.e. sweeps over the register, and the time
+per execution are reported.
+
+Usage::
+
+    python benchmarks/bench_fusion.py --wires 16 --layers 10
+    python benchmarks/bench_fusion.py --circuit qaoa --wires 16 --edges 120
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pennylane as qml
+
+from pennylane_pyquest import PyquestPure
+
+CONFIGURATIONS = {
+    "none": {},
+    "single-qubit": {"fuse_single_qubit_gates": True},
+    "diagonal": {"fuse_diagonal_gates": True},
+    "all": {"fuse_single_qubit_gates": True, "fuse_diagonal_gates": True},
+}
+
+
+def ansatz(wires, layers, seed=42):
+    rng = np.random.default_rng(seed)
+    operations = []
+
+    for _ in range(layers):
+        for wire in range(wires):
+            phi, theta, omega = rng.uniform(0, 2 * np.pi, 3)
+            operations += qml.Rot.decomposition(phi, theta, omega, wires=[wire])
+
+        for wire in range(wires - 1):
+            operations.append(qml.CNOT(wires=[wire, wire + 1]))
+
+    return operations
+
+
+def qaoa(wires, layers, edges, seed=42):
+    rng = np.random.default_rng(seed)
+    pairs = [(a, b) for a in range(wires) for b in range(a + 1, wires)]
+    graph = [pairs[idx] for idx in rng.choice(len(pairs), size=min(edges, len(pairs)), replace=False)]
+    operations = [qml.Hadamard(wires=wire) for wire in range(wires)]
+
+    for _ in range(layers):
+        gamma, beta = rng.uniform(0, 2 * np.pi, 2)
+        operations += [qml.MultiRZ(gamma, wires=list(edge)) for edge in graph]
+        operations += [qml.RX(beta, wires=wire) for wire in range(wires)]
+
+    return operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, default=12)
+    parser.add_argument("--layers", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--circuit", choices=["ansatz", "qaoa"], default="ansatz")
+    parser.add_argument("--edges", type=int, default=60)
+    args = parser.parse_args()
+
+    if args.circuit == "qaoa":
+        operations = qaoa(args.wires, args.layers, args.edges)
+    else:
+        operations = ansatz(args.wires, args.layers)
+
+    for label, options in CONFIGURATIONS.items():
+        with PyquestPure(wires=args.wires, **options) as dev:
+            sweeps = len(dev._preprocess_operations(operations))
+            best = min(timeit.repeat(lambda: dev.apply(operations), number=1, repeat=args.repeat))
+
+        print("{:>14}: {:6d} sweeps {:10.3f} ms".format(label, sweeps, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the hybrid execution of circuits with late noise on the mixed device.
+
+A layered circuit is followed by readout damping on every wire. It is simulated on a density
+matrix throughout and with its noise-free prefix simulated on a state vector.
+
+Usage::
+
+    python benchmarks/bench_hybrid.py --wires 8 10 12 --layers 20
+"""
+import argparse
+import timeit
+
+import pennylane as qml
+
+from pennylane_pyquest import PyquestMixed
+from pennylane_pyquest.ops import MixDamping
+
+CONFIGURATIONS = {
+    "density matrix": {"hybrid_execution": False},
+    "hybrid": {},
+}
+
+
+def circuit(wires, layers):
+    operations = []
+
+    for layer in range(layers):
+        for wire in range(wires):
+            operations.append(qml.RY(0.1 * (layer + wire), wires=wire, do_queue=False))
+        for wire in range(wires - 1):
+            operations.append(qml.CNOT(wires=[wire, wire + 1], do_queue=False))
+
+    operations.extend(MixDamping(0.02, wires=wire, do_queue=False) for wire in range(wires))
+
+    return operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--layers", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>6} {:>16} {:>12}".format("wires", "configuration", "time [ms]"))
+
+    for wires in args.wires:
+        operations = circuit(wires, args.layers)
+
+        for label, options in CONFIGURATIONS.items():
+            with PyquestMixed(wires=wires, **options) as dev:
+                dev.apply(operations)
+                best = min(timeit.repeat(lambda: dev.apply(operations), number=1, repeat=args.repeat))
+                print("{:>6} {:>16} {:>12.3f}".format(wires, label, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
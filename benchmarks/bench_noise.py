@@ -0,0 +1,73 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the ways to add noise to a circuit on the mixed device.
+
+A layered circuit is executed on a small register, so that the time is dominated by the
+Python overhead per gate. The noise is given as an error model function, with and without
+the error model cache, and as a noise model that is compiled into the program.
+
+Usage::
+
+    python benchmarks/bench_noise.py --gates 1000 5000
+"""
+import argparse
+import timeit
+
+import pennylane as qml
+
+from pennylane_pyquest import NoiseModel, PyquestMixed
+
+NOISE = NoiseModel().add("MixDepolarising", 0.01, gates=["CNOT"]).add("MixDephasing", 0.001)
+
+CONFIGURATIONS = {
+    "noiseless": {},
+    "error model": {"error_model": NOISE.error_model},
+    "cached error model": {"error_model": NOISE.error_model, "error_model_cache_size": 256},
+    "noise model": {"noise_model": NOISE},
+}
+
+
+def circuit(wires, gates):
+    operations = []
+
+    while len(operations) < gates:
+        for wire in range(wires):
+            operations.append(qml.RY(0.1 * len(operations), wires=wire, do_queue=False))
+        for wire in range(wires - 1):
+            operations.append(qml.CNOT(wires=[wire, wire + 1], do_queue=False))
+
+    return operations[:gates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, default=4)
+    parser.add_argument("--gates", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>6} {:>20} {:>12}".format("gates", "configuration", "time [ms]"))
+
+    for gates in args.gates:
+        operations = circuit(args.wires, gates)
+
+        for label, options in CONFIGURATIONS.items():
+            with PyquestMixed(wires=args.wires, **options) as dev:
+                dev.apply(operations)
+                best = min(timeit.repeat(lambda: dev.apply(operations), number=1, repeat=args.repeat))
+                print("{:>6} {:>20} {:>12.3f}".format(gates, label, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
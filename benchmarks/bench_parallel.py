@@ -0,0 +1,76 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the execution of a batch of circuits on worker threads.
+
+The batch contains layered circuits of the same structure with random parameters, like the
+shifted circuits of a parameter-shift gradient. It is executed serially and on an increasing
+number of worker threads.
+
+Usage::
+
+    python benchmarks/bench_parallel.py --wires 8 12 --layers 4 --circuits 32 --workers 2 4
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pennylane as qml
+
+from pennylane_pyquest import PyquestPure
+
+
+def tapes(wires, layers, circuits):
+    rng = np.random.default_rng(42)
+    batch = []
+
+    for _ in range(circuits):
+        params = rng.uniform(0, 2 * np.pi, size=(layers, wires))
+
+        with qml.tape.QuantumTape() as tape:
+            for layer in range(layers):
+                for wire in range(wires):
+                    qml.RY(params[layer, wire], wires=wire)
+                for wire in range(wires - 1):
+                    qml.CNOT(wires=[wire, wire + 1])
+
+            qml.expval(qml.PauliZ(0))
+
+        batch.append(tape)
+
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, nargs="+", default=[8, 12])
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--circuits", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>6} {:>8} {:>8} {:>12}".format("wires", "circuits", "workers", "time [ms]"))
+
+    for wires in args.wires:
+        batch = tapes(wires, args.layers, args.circuits)
+
+        for workers in [None] + args.workers:
+            with PyquestPure(wires=wires, max_workers=workers) as dev:
+                dev.batch_execute(batch)
+                best = min(timeit.repeat(lambda: dev.batch_execute(batch), number=1, repeat=args.repeat))
+                print("{:>6} {:>8} {:>8} {:>12.3f}".format(wires, len(batch), workers or 1, 1e3 * best))
+
+
+if __name__ == "__main__":
+    main()
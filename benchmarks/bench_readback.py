@@ -0,0 +1,86 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of reading the state vector back from QuEST.
+
+The state and the probabilities of a register are read with and without the zero-copy
+readback and the native qubit layout, which needs no reordering. For all configurations the
+time per readback and the peak memory allocated by NumPy are reported.
+
+Usage::
+
+    python benchmarks/bench_readback.py --wires 20 22 24
+"""
+import argparse
+import timeit
+import tracemalloc
+
+import pennylane as qml
+
+from pennylane_pyquest import PyquestPure
+
+
+CONFIGURATIONS = {
+    "copy": {},
+    "zero-copy": {"zero_copy_readback": True},
+    "native": {"native_layout": True},
+    "zero-copy+native": {"zero_copy_readback": True, "native_layout": True},
+}
+
+READBACKS = {
+    "state": lambda dev: dev.state,
+    "probability": lambda dev: dev.probability(),
+}
+
+
+def measure(dev, read, repeat):
+    def readback():
+        # discard the information of the previous readback
+        dev._clear_information()
+        return read(dev)
+
+    readback()
+    tracemalloc.start()
+    readback()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(timeit.repeat(readback, number=1, repeat=repeat)), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wires", type=int, nargs="+", default=[16, 18, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>6} {:>12} {:>18} {:>12} {:>12}".format("wires", "readback", "configuration", "time [ms]", "peak [MiB]"))
+
+    for wires in args.wires:
+        operations = [qml.Hadamard(wires=wire) for wire in range(wires)]
+
+        for label, options in CONFIGURATIONS.items():
+            with PyquestPure(wires=wires, **options) as dev:
+                dev.apply(operations)
+
+                for attribute, read in READBACKS.items():
+                    best, peak = measure(dev, read, args.repeat)
+                    print(
+                        "{:>6} {:>12} {:>18} {:>12.3f} {:>12.1f}".format(
+                            wires, attribute, label, 1e3 * best, peak / 2 ** 20
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
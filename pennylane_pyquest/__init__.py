@@ -16,6 +16,7 @@ Plugin overview
 ===============
 """
 from ._version import __version__
+from .noise import NoiseModel
 from .ops import *
 from .pyquest_mixed import PyquestMixed
 from .pyquest_pure import PyquestPure
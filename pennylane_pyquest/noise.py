@@ -0,0 +1,271 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Noise models
+============
+
+**Module name:** :mod:`pennylane_pyquest.noise`
+
+.. currentmodule:: pennylane_pyquest.noise
+
+A declarative description of the noise of a circuit. Every rule of a noise model attaches a
+single-qubit channel with fixed parameters to the wires of the gates it matches. In contrast to
+an ``error_model`` function, the device compiles a noise model once into its programs, so that
+no Python code is run per gate when a noisy circuit is executed.
+
+Noise models can be converted to plain dictionaries of lists, strings and numbers, which can be
+stored as JSON or sent to worker processes.
+
+Classes
+-------
+
+.. autosummary::
+   NoiseModel
+   NoiseRule
+
+Code details
+~~~~~~~~~~~~
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from . import ops
+from .pyquest_operation import _OPERATIONS
+
+CHANNELS = ("MixDephasing", "MixDepolarising", "MixDamping", "MixKrausMap")
+
+NoiseRule = namedtuple("NoiseRule", ["channel", "parameter", "gates", "wires"])
+NoiseRule.__doc__ = """A rule of a :class:`NoiseModel`.
+
+Args:
+    channel (str): the name of the channel, one of ``MixDephasing``, ``MixDepolarising``,
+        ``MixDamping`` and ``MixKrausMap``
+    parameter (float or list[array[complex]]): the probability of the channel or the Kraus
+        operators of a ``MixKrausMap``
+    gates (frozenset[str]): the names of the gates the rule applies to, ``None`` for all gates
+    wires (frozenset[int]): the wires the channel is applied to, ``None`` for all wires
+"""
+
+
+def _base_name(name):
+    return name[:-4] if name.endswith(".inv") else name
+
+
+def _encode(channel, parameter):
+    if channel != "MixKrausMap":
+        return float(parameter)
+
+    return [{"real": np.real(op).tolist(), "imag": np.imag(op).tolist()} for op in parameter]
+
+
+def _decode(channel, parameter):
+    if channel != "MixKrausMap":
+        return float(parameter)
+
+    return [np.array(op["real"]) + 1j * np.array(op["imag"]) for op in parameter]
+
+
+class NoiseModel:
+    """Declarative noise model for the ``pyquest.mixed`` device.
+
+    A channel is applied after every gate a rule matches, on every wire of the gate that
+    the rule covers. Channels that follow the same gate are applied in the order of the rules.
+    Channels, like the ones returned by an error model, never receive noise themselves.
+
+    **Example:**
+
+    >>> noise = NoiseModel()
+    >>> noise.add("MixDepolarising", 0.01, gates=["CNOT", "CZ"])
+    >>> noise.add("MixDamping", 0.002, wires=[0])
+    >>> dev = qml.device("pyquest.mixed", wires=2, noise_model=noise)
+
+    Args:
+        rules (list[NoiseRule]): the initial rules of the model
+    """
+
+    def __init__(self, rules=None):
+        self._rules = []
+
+        for rule in rules or []:
+            self.add(*rule)
+
+    @property
+    def rules(self):
+        """list[NoiseRule]: the rules of the model"""
+        return list(self._rules)
+
+    def add(self, channel, parameter, gates=None, wires=None):
+        """Add a rule to the model.
+
+        Args:
+            channel (str): the name of the channel, one of ``MixDephasing``, ``MixDepolarising``,
+                ``MixDamping`` and ``MixKrausMap``
+            parameter (float or list[array[complex]]): the probability of the channel or the
+                Kraus operators of a ``MixKrausMap``
+            gates (Iterable[str]): the names of the gates the rule applies to, by default all gates
+            wires (Iterable[int]): the wires the channel is applied to, by default all wires
+
+        Returns:
+            NoiseModel: the model itself
+        """
+        if channel not in CHANNELS:
+            raise ValueError("Unknown noise channel {}, expected one of {}.".format(channel, ", ".join(CHANNELS)))
+
+        if channel == "MixKrausMap":
+            parameter = [np.asarray(op, dtype=np.complex128) for op in parameter]
+        else:
+            parameter = float(parameter)
+
+        gates = frozenset(gates) if gates is not None else None
+        wires = frozenset(wires) if wires is not None else None
+        self._rules.append(NoiseRule(channel, parameter, gates, wires))
+
+        return self
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __eq__(self, other):
+        if not isinstance(other, NoiseModel):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
+    def errors(self, name, wires):
+        """Return the channels that are applied after a gate.
+
+        Args:
+            name (str): the name of the gate
+            wires (Iterable[int]): the wires of the gate
+
+        Returns:
+            list[tuple[str, object, int]]: the name, parameter and wire of every channel
+        """
+        if name in CHANNELS:
+            return []
+
+        base = _base_name(name)
+        out = []
+
+        for rule in self._rules:
+            if rule.gates is not None and name not in rule.gates and base not in rule.gates:
+                continue
+
+            for wire in wires:
+                if rule.wires is None or wire in rule.wires:
+                    out.append((rule.channel, rule.parameter, wire))
+
+        return out
+
+    def error_model(self, operation):
+        """The model as an ``error_model`` function.
+
+        Args:
+            operation (~.Operation): the operation
+
+        Returns:
+            list[~.Operation]: the channels that are applied after the operation
+        """
+        return [
+            getattr(ops, channel)(parameter, wires=wire, do_queue=False)
+            for channel, parameter, wire in self.errors(operation.name, operation.wires.labels)
+        ]
+
+    def compile(self, calls=None):
+        """Compile the model to kernel calls.
+
+        Args:
+            calls (dict[str, callable]): the calls that apply the channels, by default the
+                kernels of the dispatch table
+
+        Returns:
+            callable: maps the name and wires of a gate to the instructions ``(call, wires)``
+            of the channels applied after it, see :class:`~.PyquestProgram`
+        """
+        return _CompiledNoiseModel(self, calls)
+
+    def to_dict(self):
+        """Convert the model to a dictionary of plain Python types.
+
+        Returns:
+            dict: the serialized model
+        """
+        return {
+            "rules": [
+                {
+                    "channel": rule.channel,
+                    "parameter": _encode(rule.channel, rule.parameter),
+                    "gates": sorted(rule.gates) if rule.gates is not None else None,
+                    "wires": sorted(rule.wires) if rule.wires is not None else None,
+                }
+                for rule in self._rules
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a model from a dictionary returned by :meth:`to_dict`.
+
+        Args:
+            data (dict): the serialized model
+
+        Returns:
+            NoiseModel: the model
+        """
+        model = cls()
+
+        for rule in data["rules"]:
+            model.add(rule["channel"], _decode(rule["channel"], rule["parameter"]), rule["gates"], rule["wires"])
+
+        return model
+
+
+class _CompiledNoiseModel:
+    """The instructions of a noise model, memoized per gate name and wires."""
+
+    def __init__(self, model, calls=None):
+        self.model = model
+        self.calls = calls
+        self._instructions = {}
+
+    def _make_call(self, channel, parameter):
+        if self.calls is not None and channel in self.calls:
+            channel_call = self.calls[channel]
+            parameters = (parameter,)
+
+            def call(qureg, wires, _):
+                channel_call(qureg, wires, parameters)
+
+            return call
+
+        fn = _OPERATIONS[channel].kernel.call_interactive
+
+        def call(qureg, wires, _):
+            fn(qureg, *wires, parameter)
+
+        return call
+
+    def __call__(self, name, wires):
+        key = (name, tuple(wires))
+        instructions = self._instructions.get(key)
+
+        if instructions is None:
+            instructions = tuple(
+                (self._make_call(channel, parameter), (wire,))
+                for channel, parameter, wire in self.model.errors(name, wires)
+            )
+            self._instructions[key] = instructions
+
+        return instructions
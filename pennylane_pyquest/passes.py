@@ -0,0 +1,510 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Circuit passes
+==============
+
+**Module name:** :mod:`pennylane_pyquest.passes`
+
+.. currentmodule:: pennylane_pyquest.passes
+
+Passes that rewrite the operations of a circuit before they are sent to QuEST. Every gate
+applied by QuEST is a full sweep over the amplitudes of the register, so the passes try to
+reduce the number of gates without changing the simulated state.
+
+A pass is a callable that takes a list of operations and returns the rewritten list.
+
+Functions
+---------
+
+.. autosummary::
+   light_cone
+
+Classes
+-------
+
+.. autosummary::
+   PeepholeOptimizer
+   SingleQubitFusion
+   DiagonalFusion
+   BlockFusion
+
+Code details
+~~~~~~~~~~~~
+"""
+import functools
+
+import numpy as np
+import pennylane as qml
+
+from .pyquest_operation import _inverse_name
+
+_STATE_PREPARATIONS = {"BasisState", "QubitStateVector"}
+
+_SELF_INVERSE_GATES = {"Hadamard", "PauliX", "PauliY", "PauliZ", "CNOT", "CY", "CZ", "SWAP", "Toffoli", "CSWAP"}
+
+# gates that do not depend on the order of their wires
+_SYMMETRIC_GATES = {"CZ", "SWAP", "MultiRZ", "ControlledPhaseShift"}
+
+# gates of the form exp(-i theta G / 2) whose angles add up when applied after each other
+_ROTATIONS = {"RX", "RY", "RZ", "PhaseShift", "CRX", "CRY", "CRZ", "MultiRZ", "PauliRot", "ControlledPhaseShift"}
+
+# operations that are the identity if all their parameters vanish
+_TRIVIAL_AT_ZERO = _ROTATIONS | {"Rot", "MixDephasing", "MixDepolarising", "MixDamping"}
+
+_DIAGONAL_GATES = {
+    "Identity",
+    "PauliZ",
+    "S",
+    "T",
+    "RZ",
+    "PhaseShift",
+    "CZ",
+    "CRZ",
+    "ControlledPhaseShift",
+    "MultiRZ",
+    "DiagonalQubitUnitary",
+}
+
+
+def _matrix(operation):
+    """Return the matrix of a unitary gate, or ``None`` if it is not known."""
+    if operation.name in _STATE_PREPARATIONS:
+        return None
+
+    try:
+        return operation.matrix
+    except (NotImplementedError, ValueError):
+        return None
+
+
+def _fuse(matrices, wires):
+    # the first gate is applied first and thus the rightmost factor
+    matrix = functools.reduce(lambda total, factor: factor @ total, matrices)
+
+    return qml.QubitUnitary(matrix, wires=wires, do_queue=False)
+
+
+def _base_name(operation):
+    return operation.name[:-4] if operation.name.endswith(".inv") else operation.name
+
+
+def _same_wires(first, second):
+    if _base_name(first) in _SYMMETRIC_GATES:
+        return set(first.wires.labels) == set(second.wires.labels)
+
+    return first.wires.labels == second.wires.labels
+
+
+def _signed_angle(operation):
+    return -operation.parameters[0] if operation.inverse else operation.parameters[0]
+
+
+def _diagonal(operation):
+    """Return the diagonal of a diagonal gate, or ``None`` if the gate is not diagonal."""
+    name = operation.name[:-4] if operation.name.endswith(".inv") else operation.name
+
+    if name not in _DIAGONAL_GATES:
+        return None
+
+    if name == "ControlledPhaseShift":
+        # the custom operation of the plugin does not provide a matrix
+        phase = -operation.parameters[0] if operation.inverse else operation.parameters[0]
+        return np.array([1, 1, 1, np.exp(1j * phase)])
+
+    matrix = _matrix(operation)
+
+    return None if matrix is None else np.diag(matrix)
+
+
+def _vanishes(operation):
+    return all(np.all(np.asarray(p) == 0) for p in operation.parameters if not isinstance(p, str))
+
+
+def _parameters_equal(first, second):
+    if len(first.parameters) != len(second.parameters):
+        return False
+
+    return all(np.array_equal(a, b) for a, b in zip(first.parameters, second.parameters))
+
+
+def _merge_rotations(previous, operation):
+    """Return a single rotation equivalent to two rotations of the same kind, or ``None``."""
+    name = _base_name(operation)
+
+    if name != _base_name(previous) or name not in _ROTATIONS:
+        return None
+
+    extra = operation.parameters[1:]
+    if extra != previous.parameters[1:]:
+        return None
+
+    angle = _signed_angle(previous) + _signed_angle(operation)
+
+    return type(operation)(angle, *extra, wires=operation.wires, do_queue=False)
+
+
+def _walsh_hadamard(values):
+    """Unnormalized fast Walsh-Hadamard transform of a vector of length ``2**n``."""
+    values = np.asarray(values, dtype=float)
+    size = len(values)
+    step = 1
+
+    while step < size:
+        values = values.reshape(-1, 2, step)
+        values = np.stack([values[:, 0] + values[:, 1], values[:, 0] - values[:, 1]], axis=1)
+        step *= 2
+
+    return values.ravel()
+
+
+def _fuse_diagonal(block, wires):
+    # A diagonal unitary is exp(i phi(x)) and the phase function of every gate expands into
+    # parity terms (-1)^(S.x) over the subsets S of its wires. The coefficients of all gates
+    # are collected in one vector over the subsets of the block wires, a single transform
+    # then yields the phase function of the whole block.
+    wires = sorted(wires)
+    position = {wire: idx for idx, wire in enumerate(wires)}
+    coefficients = np.zeros(2 ** len(wires))
+
+    for operation, diagonal in block:
+        labels = operation.wires.labels
+        num_local = len(labels)
+        local = _walsh_hadamard(np.angle(diagonal)) / 2 ** num_local
+
+        for subset in range(2 ** num_local):
+            mask = 0
+            for idx, wire in enumerate(labels):
+                if subset >> (num_local - 1 - idx) & 1:
+                    mask |= 1 << position[wire]
+
+            coefficients[mask] += local[subset]
+
+    diagonal = np.exp(1j * _walsh_hadamard(coefficients))
+
+    # the first wire of an operation is the most significant one, listing the wires in
+    # descending order makes the index of the diagonal match the QuEST amplitude order
+    return qml.DiagonalQubitUnitary(diagonal, wires=wires[::-1], do_queue=False)
+
+
+def light_cone(operations, wires):
+    """Drop the operations that can not influence the state of the given wires.
+
+    The circuit is walked backwards starting from the measured wires. An operation acting on
+    a wire of the light cone is kept and adds all its wires to the light cone, all other
+    operations are dropped. As a basis state is a product state, a ``BasisState`` is
+    restricted to the wires in the light cone instead of widening it.
+
+    Args:
+        operations (list[~.Operation]): the operations of the circuit
+        wires (Iterable): the measured wires
+
+    Returns:
+        list[~.Operation]: the operations inside the light cone
+    """
+    cone = set(wires)
+    kept = []
+
+    for operation in reversed(operations):
+        labels = operation.wires.labels
+
+        if cone.isdisjoint(labels):
+            continue
+
+        if operation.name == "BasisState":
+            indices = [idx for idx, wire in enumerate(labels) if wire in cone]
+
+            if len(indices) < len(labels):
+                bits = np.asarray(operation.parameters[0])[indices]
+                operation = qml.BasisState(bits, wires=[labels[idx] for idx in indices], do_queue=False)
+        else:
+            cone.update(labels)
+
+        kept.append(operation)
+
+    return kept[::-1]
+
+
+class PeepholeOptimizer:
+    """Remove gates that cancel with their neighbours.
+
+    The optimizer walks through the circuit and compares every gate with the last gate that
+    was kept on the same wires:
+
+    * a self-inverse gate like ``Hadamard`` or ``CNOT``, or a gate followed by its inverse,
+      cancels with its predecessor,
+    * adjacent rotations of the same kind, like ``RZ(a)`` and ``RZ(b)``, are merged into one,
+    * rotations and channels whose parameters are all zero are dropped.
+
+    As the comparison is done against the kept gates, cancellations cascade, e.g.
+    ``H X X H`` is removed completely. The numbers of removed gates are accumulated in
+    :attr:`stats`.
+    """
+
+    def __init__(self):
+        self.stats = {"cancelled": 0, "merged": 0, "dropped": 0}
+
+    def __call__(self, operations):
+        kept = []
+        # indices into kept of the gates on every wire, the last one is the current neighbour
+        stacks = {}
+
+        def remove_last(operation):
+            idx = stacks[operation.wires.labels[0]][-1]
+            kept[idx] = None
+
+            for wire in operation.wires.labels:
+                stacks[wire].pop()
+
+        for operation in operations:
+            name = _base_name(operation)
+
+            if name in _TRIVIAL_AT_ZERO and _vanishes(operation):
+                self.stats["dropped"] += 1
+                continue
+
+            wires = operation.wires.labels
+            tops = {stacks[wire][-1] if stacks.get(wire) else None for wire in wires}
+            previous = kept[tops.pop()] if len(tops) == 1 and None not in tops else None
+
+            if previous is not None and _same_wires(previous, operation):
+                if (name in _SELF_INVERSE_GATES and previous.name == operation.name) or (
+                    previous.name == _inverse_name(operation.name) and _parameters_equal(previous, operation)
+                ):
+                    remove_last(previous)
+                    self.stats["cancelled"] += 2
+                    continue
+
+                merged = _merge_rotations(previous, operation)
+
+                if merged is not None:
+                    remove_last(previous)
+                    self.stats["merged"] += 1
+
+                    if _vanishes(merged):
+                        self.stats["dropped"] += 1
+                        continue
+
+                    operation = merged
+
+            for wire in operation.wires.labels:
+                stacks.setdefault(wire, []).append(len(kept))
+
+            kept.append(operation)
+
+        return [operation for operation in kept if operation is not None]
+
+
+class SingleQubitFusion:
+    """Fuse consecutive single-qubit gates on the same wire into one unitary.
+
+    Gates on a wire are collected until another operation acts on that wire, the collected
+    gates are then replaced by a single :class:`~pennylane.QubitUnitary`. Operations without a
+    known matrix, like channels and state preparations, are never fused.
+    """
+
+    def __call__(self, operations):
+        fused = []
+        pending = {}
+
+        def flush(wire):
+            run = pending.pop(wire)
+
+            if len(run) == 1:
+                fused.append(run[0][0])
+            else:
+                fused.append(_fuse([matrix for _, matrix in run], [wire]))
+
+        for operation in operations:
+            matrix = _matrix(operation) if len(operation.wires) == 1 else None
+
+            if matrix is not None:
+                pending.setdefault(operation.wires.labels[0], []).append((operation, matrix))
+                continue
+
+            for wire in operation.wires.labels:
+                if wire in pending:
+                    flush(wire)
+
+            fused.append(operation)
+
+        for wire in list(pending):
+            flush(wire)
+
+        return fused
+
+
+class DiagonalFusion:
+    """Fuse diagonal gates into one diagonal unitary.
+
+    Diagonal gates commute with each other, so all diagonal gates are collected into a block
+    until a non-diagonal operation acts on one of the block wires. Non-diagonal operations on
+    other wires are moved in front of the block. The block is replaced by a single
+:class:`~pennylane.DiagonalQubitUnitary`, which turns for example the phase gates of a
+    QAOA cost layer that act on the same few wires into a single sweep over the register.
+    The devices limit the blocks to four wires, as QuEST applies them as dense unitaries.
+
+    Args:
+        max_width (int): the maximal number of wires of a fused block, ``None`` for no limit
+    """
+
+    def __init__(self, max_width=None):
+        if max_width is not None and max_width < 1:
+            raise ValueError("The maximal width of a fused block must be positive, got {}.".format(max_width))
+
+        self.max_width = max_width
+
+    def __call__(self, operations):
+        fused = []
+        block = []
+        block_wires = set()
+        # wires of operations that were moved in front of the pending block
+        passed_wires = set()
+
+        def flush():
+            if len(block) == 1:
+                fused.append(block[0][0])
+            elif block:
+                fused.append(_fuse_diagonal(block, block_wires))
+
+            block.clear()
+            block_wires.clear()
+            passed_wires.clear()
+
+        for operation in operations:
+            wires = set(operation.wires.labels)
+            diagonal = _diagonal(operation)
+
+            if diagonal is not None:
+                too_wide = self.max_width is not None and len(block_wires | wires) > self.max_width
+
+                if too_wide or not wires.isdisjoint(passed_wires):
+                    flush()
+
+                block.append((operation, diagonal))
+                block_wires.update(wires)
+                continue
+
+            if not wires.isdisjoint(block_wires):
+                flush()
+            elif block:
+                passed_wires.update(wires)
+
+            fused.append(operation)
+
+        flush()
+
+        return fused
+
+
+def _expand(matrix, wires, block_wires):
+    """Embed the matrix of a gate on ``wires`` into the space of ``block_wires``."""
+    rest = [wire for wire in block_wires if wire not in wires]
+    matrix = np.kron(matrix, np.eye(2 ** len(rest)))
+
+    # axes of the expanded matrix follow the order wires + rest, move them to the block order
+    num_wires = len(block_wires)
+    order = list(wires) + rest
+    perm = [order.index(wire) for wire in block_wires]
+    tensor = matrix.reshape([2] * (2 * num_wires))
+    tensor = tensor.transpose(perm + [num_wires + idx for idx in perm])
+
+    return tensor.reshape(2 ** num_wires, 2 ** num_wires)
+
+
+class BlockFusion:
+    """Fuse gates acting on a few wires into blocks applied as one unitary.
+
+    Gates are collected into blocks of at most ``max_width`` wires. A gate joins the blocks
+    that act on its wires as long as the merged block is not wider than ``max_width``,
+    otherwise these blocks are closed and the gate starts a new one. Every block with more
+    than one gate is replaced by a single :class:`~pennylane.QubitUnitary`, so that for example
+    a layer of rotations and an entangling gate on the same pair of wires costs one sweep.
+
+    The cost of applying a block grows with ``2**max_width``, so small widths of 2 to 4 wires
+    are the sensible choice.
+
+    Args:
+        max_width (int): the maximal number of wires of a fused block
+    """
+
+    def __init__(self, max_width=2):
+        if max_width < 1:
+            raise ValueError("The maximal width of a fused block must be positive, got {}.".format(max_width))
+
+        self.max_width = max_width
+
+    def __call__(self, operations):
+        fused = []
+        # open blocks by wire, every block is a pair (wires, [(operation, matrix), ...])
+        blocks = {}
+
+        def touched(wires):
+            return _unique(blocks[wire] for wire in wires if wire in blocks)
+
+        def flush(block):
+            block_wires, entries = block
+
+            for wire in block_wires:
+                del blocks[wire]
+
+            if len(entries) == 1:
+                fused.append(entries[0][0])
+                return
+
+            block_wires = sorted(block_wires)
+            matrices = [_expand(matrix, operation.wires.labels, block_wires) for operation, matrix in entries]
+            fused.append(_fuse(matrices, block_wires))
+
+        for operation in operations:
+            wires = operation.wires.labels
+            matrix = _matrix(operation) if len(wires) <= self.max_width else None
+            neighbours = touched(wires)
+
+            if matrix is None:
+                for block in neighbours:
+                    flush(block)
+
+                fused.append(operation)
+                continue
+
+            merged_wires = set(wires).union(*(block_wires for block_wires, _ in neighbours))
+
+            if len(merged_wires) > self.max_width:
+                for block in neighbours:
+                    flush(block)
+
+                neighbours = []
+                merged_wires = set(wires)
+
+            # blocks on disjoint wires commute and can be merged in any order
+            merged = (merged_wires, [entry for _, entries in neighbours for entry in entries])
+            merged[1].append((operation, matrix))
+
+            for wire in merged_wires:
+                blocks[wire] = merged
+
+        for block in _unique(blocks.values()):
+            flush(block)
+
+        return fused
+
+
+def _unique(blocks):
+    unique = []
+    for block in blocks:
+        if not any(block is other for other in unique):
+            unique.append(block)
+
+    return unique
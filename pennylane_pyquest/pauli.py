@@ -0,0 +1,217 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Pauli observables
+=================
+
+**Module name:** :mod:`pennylane_pyquest.pauli`
+
+.. currentmodule:: pennylane_pyquest.pauli
+
+Conversion of PennyLane observables to the Pauli codes used by QuEST. A Pauli word is
+represented as a dictionary that maps wire labels to the codes ``0`` (identity), ``1`` (X),
+``2`` (Y) and ``3`` (Z); a Pauli sum as a list of ``(coefficient, word)`` tuples.
+
+Functions
+---------
+
+.. autosummary::
+   pauli_word
+   pauli_terms
+   pauli_codes
+   generator_terms
+   multiply_words
+   square_terms
+
+Code details
+~~~~~~~~~~~~
+"""
+from pennylane import Hamiltonian
+from pennylane.operation import Tensor
+
+from .pyquest_operation import _pauli_to_int
+
+_OBSERVABLE_TO_INT_DICT = {"Identity": 0, "PauliX": 1, "PauliY": 2, "PauliZ": 3}
+
+
+def _projector_one(wire):
+    # |1><1| = (I - Z) / 2
+    return [(0.5, {wire: 0}), (-0.5, {wire: 3})]
+
+
+def _controlled(code):
+    # |1><1| on the control times the Pauli on the target
+    return lambda operation: [
+        (0.5, {operation.wires.labels[1]: code}),
+        (-0.5, {operation.wires.labels[0]: 3, operation.wires.labels[1]: code}),
+    ]
+
+
+_GENERATORS = {
+    "RX": lambda operation: [(1.0, {operation.wires.labels[0]: 1})],
+    "RY": lambda operation: [(1.0, {operation.wires.labels[0]: 2})],
+    "RZ": lambda operation: [(1.0, {operation.wires.labels[0]: 3})],
+    "PhaseShift": lambda operation: _projector_one(operation.wires.labels[0]),
+    "CRX": _controlled(1),
+    "CRY": _controlled(2),
+    "CRZ": _controlled(3),
+    "MultiRZ": lambda operation: [(1.0, {wire: 3 for wire in operation.wires.labels})],
+    "PauliRot": lambda operation: [
+        (1.0, dict(zip(operation.wires.labels, _pauli_to_int(operation.parameters[1]))))
+    ],
+}
+
+
+def pauli_word(observable):
+    """Convert a Pauli observable or a tensor product of Pauli observables to a Pauli word.
+
+    Args:
+        observable (~.Observable): the observable
+
+    Returns:
+        dict[Any, int] or None: the Pauli word or ``None`` if the observable is not a Pauli word
+    """
+    factors = observable.obs if isinstance(observable, Tensor) else [observable]
+    word = {}
+
+    for factor in factors:
+        code = _OBSERVABLE_TO_INT_DICT.get(factor.name)
+
+        if code is None:
+            return None
+
+        for wire in factor.wires.labels:
+            word[wire] = code
+
+    return word
+
+
+def pauli_terms(observable):
+    """Convert a Pauli word or a Hamiltonian of Pauli words to a Pauli sum.
+
+    Args:
+        observable (~.Observable or ~.Hamiltonian): the observable
+
+    Returns:
+        list[tuple[float, dict[Any, int]]] or None: the terms of the sum or ``None`` if the
+        observable can not be expressed as a sum of Pauli words
+    """
+    if isinstance(observable, Hamiltonian):
+        terms = []
+
+        for coeff, op in zip(observable.coeffs, observable.ops):
+            word = pauli_word(op)
+
+            if word is None:
+                return None
+
+            terms.append((float(coeff), word))
+
+        return terms
+
+    word = pauli_word(observable)
+
+    if word is None:
+        return None
+
+    return [(1.0, word)]
+
+
+def pauli_codes(terms, num_wires):
+    """Convert a Pauli sum to the flat representation used by QuEST.
+
+    Args:
+        terms (list[tuple[float, dict[Any, int]]]): the terms of the sum
+        num_wires (int): the number of qubits of the register
+
+    Returns:
+        tuple[list[list[int]], list[float]]: the Pauli codes of every qubit for each term
+        and the coefficients of the terms
+    """
+    paulis = []
+    for _, word in terms:
+        codes = [0] * num_wires
+        for wire, code in word.items():
+            codes[wire] = code
+
+        paulis.append(codes)
+
+    return paulis, [coeff for coeff, _ in terms]
+
+
+def generator_terms(operation):
+    """Convert the generator of a single-parameter gate to a Pauli sum.
+
+    The prefactor of the generator is not included, it is given by ``operation.generator[1]``.
+
+    Args:
+        operation (~.Operation): the gate
+
+    Returns:
+        list[tuple[float, dict[Any, int]]] or None: the terms of the generator or ``None`` if
+        the generator of the gate is not known
+    """
+    generator = _GENERATORS.get(operation.name.replace(".inv", ""))
+
+    if generator is None:
+        return None
+
+    return generator(operation)
+
+
+def multiply_words(word1, word2):
+    """Multiply two Pauli words.
+
+    Args:
+        word1 (dict[Any, int]): the left factor
+        word2 (dict[Any, int]): the right factor
+
+    Returns:
+        tuple[complex, dict[Any, int]]: the phase and the Pauli word of the product
+    """
+    phase = 1
+    word = dict(word1)
+
+    for wire, code2 in word2.items():
+        code1 = word.get(wire, 0)
+
+        if code1 and code2 and code1 != code2:
+            # XY = iZ, YZ = iX, ZX = iY and the reversed products pick up -i
+            phase *= 1j if (code2 - code1) % 3 == 1 else -1j
+
+        # with X = 1, Y = 2, Z = 3 the product of two Paulis is the XOR of their codes
+        word[wire] = code1 ^ code2
+
+    return phase, word
+
+
+def square_terms(terms):
+    """Square a Pauli sum.
+
+    Args:
+        terms (list[tuple[float, dict[Any, int]]]): the terms of a Hermitian Pauli sum
+
+    Returns:
+        list[tuple[float, dict[Any, int]]]: the terms of the squared sum
+    """
+    squared = {}
+
+    for coeff1, word1 in terms:
+        for coeff2, word2 in terms:
+            phase, word = multiply_words(word1, word2)
+            key = tuple(sorted(word.items()))
+            squared[key] = squared.get(key, 0) + coeff1 * coeff2 * phase
+
+    # the imaginary parts of anticommuting pairs cancel
+    return [(coeff.real, dict(key)) for key, coeff in squared.items() if coeff.real]
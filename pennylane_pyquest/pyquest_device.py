@@ -31,16 +31,28 @@ Code details
 ~~~~~~~~~~~~
 """
 import abc
+import copy
 import itertools
+import os
+import queue
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 # we always import NumPy directly
 import numpy as np
 import pyquest_cffi as pqc
 from pennylane import QubitDevice
+from pennylane.operation import Expectation, State, Variance
+from pennylane.wires import Wires
 
 from ._version import __version__
-from .pyquest_operation import _OPERATIONS
-from .utils import reorder_state
+from .passes import BlockFusion, DiagonalFusion, PeepholeOptimizer, SingleQubitFusion, light_cone
+from .pauli import pauli_codes, pauli_terms, square_terms
+from .pyquest_operation import _NATIVE_LAYOUT_OPERATIONS, _OPERATIONS
+from .pyquest_program import ProgramCache
+from . import quest_env
+from .qureg_pool import QuregPool
+from .utils import marginal_probabilities, reorder_state
 
 
 class PyquestDevice(QubitDevice):
@@ -51,8 +63,25 @@ class PyquestDevice(QubitDevice):
         shots (int): Number of circuit evaluations/random samples used
             to estimate expectation values of observables.
             For simulator devices, 0 means the exact EV is returned.
-        additional_option (float): as many additional arguments can be
-            added as needed
+        max_pool_size (int): the maximal number of idle QuEST registers the device keeps
+            allocated between executions
+        program_cache_size (int): the maximal number of compiled circuits the device keeps
+            for reuse, 0 disables caching
+        light_cone (bool): whether operations that can not influence the measured wires are
+            dropped before the simulation, in analytic mode only the wires in the light cone
+            are simulated and the state of the device is not available after an execution
+        peephole_optimization (bool): whether gates that cancel with their neighbours are
+            removed and adjacent rotations are merged before the simulation
+        fuse_single_qubit_gates (bool): whether runs of single-qubit gates on the same wire
+            are fused into one unitary before the simulation
+        fuse_diagonal_gates (bool): whether commuting diagonal gates are fused into one
+            diagonal unitary before the simulation
+        max_fused_width (int): if given, gates are fused into unitaries acting on at most
+            this many wires before the simulation, sensible values are 2 to 4
+        native_layout (bool): whether wire ``w`` is simulated on qubit ``n - 1 - w``, so that
+            states, matrices and readbacks need no reordering between PennyLane and QuEST
+        max_workers (int): if given, the circuits of a batch are executed concurrently by this
+            many threads, each with its own registers and a share of the OpenMP threads of QuEST
     """
     name = "Pyquest Simulator PennyLane plugin"
     pennylane_requires = ">=0.8.0"
@@ -62,49 +91,617 @@ class PyquestDevice(QubitDevice):
     short_name = "pyquest.base"
     _operation_map = {}
 
-    def __init__(self, wires, *, shots=1000, analytic=True):
+    # the maximal width of fused diagonals, which are applied as a dense matrix
+    _dense_diagonal_width = 4
+
+    # the compiled noise model that is inserted into every program, see NoiseModel.compile
+    _noise = None
+
+    def __init__(
+        self,
+        wires,
+        *,
+        shots=1000,
+        analytic=True,
+        max_pool_size=2,
+        program_cache_size=32,
+        light_cone=False,
+        peephole_optimization=False,
+        fuse_single_qubit_gates=False,
+        fuse_diagonal_gates=False,
+        max_fused_width=None,
+        native_layout=False,
+        max_workers=None,
+    ):
         super().__init__(wires, shots, analytic)
 
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("The number of workers must be positive, got {}.".format(max_workers))
+
+        self._native_layout = native_layout
+
+        self._pool = QuregPool(max_pool_size)
+        self._programs = ProgramCache(program_cache_size)
+
+        self._passes = []
+        self._peephole = PeepholeOptimizer() if peephole_optimization else None
+        if self._peephole is not None:
+            self._passes.append(self._peephole)
+        if fuse_single_qubit_gates:
+            self._passes.append(SingleQubitFusion())
+        if fuse_diagonal_gates:
+            self._passes.append(DiagonalFusion(max_width=self._dense_diagonal_width))
+        if max_fused_width is not None:
+            self._passes.append(BlockFusion(max_width=max_fused_width))
+        self._special_calls = self._make_special_calls()
+
+        self._light_cone = light_cone
+        self._measured_wires = None
+        # maps the wires to the qubits of the live register, None if wire w is qubit w
+        self._qubit_map = None
+
+        # the register of the last execution stays alive until the next reset
+        self._live_contexts = []
+        self._rotations = []
+        self._rotated = True
+        # set while the circuits of a batch that were already validated are executed
+        self._validated = False
+
+        self._workers = _WorkerPool(max_workers) if max_workers else None
+        self._finalizer = weakref.finalize(self, _release_and_close, self._pool, self._live_contexts, self._workers)
+
+    @property
+    def native_layout(self):
+        """bool: whether wire ``w`` is simulated on qubit ``n - 1 - w``, fixed when the device is created
+        as the compiled programs depend on it"""
+        return self._native_layout
+
+    @property
+    def max_workers(self):
+        """int: the number of threads executing the circuits of a batch, ``None`` if they are executed serially"""
+        return self._workers.max_workers if self._workers is not None else None
+
+    def close(self):
+        """Destroy all QuEST registers held by the device and stop its worker threads.
+
+        The device can not be used for further executions after it was closed.
+        """
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.close()
+
+    def reset(self):
+        super().reset()
+
+        _release(self._live_contexts)
+        self._rotations = []
+        self._rotated = True
+        self._qubit_map = None
+        self._clear_information()
+
+    @property
+    def _qureg(self):
+        """Qureg: the register holding the state of the last execution, or ``None``"""
+        return self._live_contexts[-1].qureg if self._live_contexts else None
+
+    @property
+    def _native_expectations(self):
+        """bool: whether expectation values of Pauli words and sums are computed by QuEST"""
+        return True
+
     @abc.abstractmethod
-    def _qureg_context(self):
+    def _qureg_context(self, num_qubits):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def _extract_information(self):
+    def _clear_information(self):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def _init_state_vector(self):
+    def _extract_probabilities(self, qureg):
         raise NotImplementedError
-        
+
+    @staticmethod
+    @abc.abstractmethod
+    def _init_state_vector(qureg, state, reorder=True, pool=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def _init_basis_state(qureg, qubits, basis_state):
+        state_int = sum(int(bit) << qubit for qubit, bit in zip(qubits, basis_state))
+        pqc.cheat.initClassicalState()(qureg, state=state_int)
+
+    @property
+    def peephole_stats(self):
+        """dict[str, int]: the numbers of gates removed by the peephole optimization since the
+        device was created, split into ``"cancelled"``, ``"merged"`` and ``"dropped"`` gates"""
+        if self._peephole is None:
+            return {"cancelled": 0, "merged": 0, "dropped": 0}
+
+        return dict(self._peephole.stats)
+
+    def _make_special_calls(self):
+        # plain functions, so that cached programs do not keep the device alive
+        init_state_vector = type(self)._init_state_vector
+        init_basis_state = type(self)._init_basis_state
+        reorder = not self.native_layout
+        pool = self._pool
+
+        special_calls = {
+            "QubitStateVector": lambda qureg, wires, parameters: init_state_vector(
+                qureg, parameters[0], reorder, pool
+            ),
+            "BasisState": lambda qureg, wires, parameters: init_basis_state(qureg, wires, parameters[0]),
+        }
+
+        if self.native_layout:
+            special_calls.update({name: op.call for name, op in _NATIVE_LAYOUT_OPERATIONS.items()})
+
+        return special_calls
+
+    def _call(self, name):
+        """Return the call that applies an operation of the given name, see :class:`~.PyquestProgram`."""
+        return self._special_calls[name] if name in self._special_calls else _OPERATIONS[name].call
+
+    def _map_wires(self, wires):
+        """Return the qubits of the live register the given wires are simulated on."""
+        if self._qubit_map is None:
+            return list(wires)
+
+        return [self._qubit_map[wire] for wire in wires]
+
+    def _map_terms(self, terms):
+        """Return Pauli terms with the wires of their words replaced by the qubits of the live register."""
+        if self._qubit_map is None:
+            return terms
+
+        return [(coeff, dict(zip(self._map_wires(word), word.values()))) for coeff, word in terms]
+
+    @property
+    def _reduced(self):
+        """bool: whether the live register only holds the wires in the light cone of the measurement"""
+        return self._qubit_map is not None and len(self._qubit_map) < self.num_wires
+
     def _preprocess_operations(self, operations):
+        if self._measured_wires is not None:
+            operations = light_cone(operations, self._measured_wires)
+
+        for circuit_pass in self._passes:
+            operations = circuit_pass(operations)
+
         return operations
 
+    def check_validity(self, queue, observables):
+        if not self._validated:
+            super().check_validity(queue, observables)
+
+    def batch_execute(self, circuits):
+        """Execute a batch of circuits on the device.
+
+        Circuits that only differ in the values of their parameters, like the shifted circuits of
+        the parameter-shift rule, are validated once and run with the same compiled program. Their
+        results are collected in the rows of one preallocated array. Without workers the circuits
+        of such a group are executed one after another on the same pooled register, with workers
+        all circuits are distributed over the worker threads.
+
+        Args:
+            circuits (list[.tapes.QuantumTape]): circuits to execute on the device
+
+        Returns:
+            list[array[float]]: the results of the circuits in the order they were given
+        """
+        groups = {}
+        for idx, circuit in enumerate(circuits):
+            groups.setdefault(_structure(circuit), []).append(idx)
+
+        for indices in groups.values():
+            first = circuits[indices[0]]
+            self.check_validity(first.operations, first.observables)
+
+        if self._workers is not None and len(circuits) > 1:
+            results = self._workers.map(self, PyquestDevice._execute_validated, circuits)
+            self._num_executions += len(circuits)
+            self._collect_worker_stats()
+        else:
+            results = [None] * len(circuits)
+
+            for indices in groups.values():
+                self.reset()
+
+                for idx in indices:
+                    results[idx] = self._execute_validated(circuits[idx])
+
+        for indices in groups.values():
+            _collect(results, indices)
+
+        return results
+
+    def _execute_validated(self, circuit):
+        """Execute a circuit whose operations and observables were already validated."""
+        self._validated = True
+
+        try:
+            return self.execute(circuit)
+        finally:
+            self._validated = False
+
+    def _make_worker(self):
+        """Return a copy of the device for a worker thread, with its own registers and caches."""
+        worker = copy.copy(self)
+
+        worker._workers = None
+        worker._pool = QuregPool(self._pool.max_size)
+        worker._programs = ProgramCache(self._programs.max_size)
+        worker._passes = copy.deepcopy(self._passes)
+        worker._peephole = next((p for p in worker._passes if isinstance(p, PeepholeOptimizer)), None)
+        if worker._peephole is not None:
+            # the gates removed by a worker are added to the statistics of the device
+            worker._peephole.stats = dict.fromkeys(worker._peephole.stats, 0)
+        worker._special_calls = worker._make_special_calls()
+
+        worker._measured_wires = None
+        worker._qubit_map = None
+        worker._live_contexts = []
+        worker._rotations = []
+        worker._rotated = True
+        worker._validated = False
+
+        if getattr(self, "_cache_execute", None) is not None:
+            worker._cache_execute = type(self._cache_execute)()
+
+        worker._finalizer = weakref.finalize(
+            worker, _release_and_close, worker._pool, worker._live_contexts, None
+        )
+
+        return worker
+
+    def _collect_worker_stats(self):
+        """Move the numbers of gates removed on the worker copies into the statistics of the device."""
+        if self._peephole is None:
+            return
+
+        for worker in self._workers._devices:
+            for key, count in worker._peephole.stats.items():
+                self._peephole.stats[key] += count
+                worker._peephole.stats[key] = 0
+
+    def _worker_key(self):
+        """The settings that can change during the lifetime of the device, the worker copies
+        are created again if they do. All other settings are fixed when the device is created."""
+        return self.shots, self.analytic
+
+    def execute(self, circuit, **kwargs):
+        if self._light_cone:
+            self._measured_wires = _measured_wires(circuit)
+
+        try:
+            return super().execute(circuit, **kwargs)
+        finally:
+            self._measured_wires = None
+
     def apply(self, operations, rotations=None, **kwargs):
-        with self._qureg_context() as context:
-            pqc.cheat.initZeroState()(qureg=context.qureg)
+        operations = self._preprocess_operations(operations)
+        wire_map = None
+
+        if self._measured_wires is not None and self.analytic:
+            cone = set(self._measured_wires).union(*(operation.wires.labels for operation in operations))
+
+            if len(cone) < self.num_wires:
+                wire_map = _layout(sorted(cone), self.native_layout)
+
+        if wire_map is None and self.native_layout:
+            wire_map = _layout(range(self.num_wires), True)
+
+        self._qubit_map = wire_map
+        self._clear_information()
+
+        # Pauli observables are evaluated on the unrotated register, so the
+        # rotations are only applied once the probabilities are needed
+        self._rotations = self._preprocess_operations(rotations) if rotations else []
+        self._rotated = False
+
+        self._simulate(operations, len(wire_map) if wire_map else self.num_wires)
+
+    def _simulate(self, operations, num_qubits):
+        """Apply operations to a new live register that starts in the zero state."""
+        qureg = self._acquire(self._qureg_context(num_qubits))
+        pqc.cheat.initZeroState()(qureg=qureg)
+        self._run_program(operations, qureg)
+
+    def _acquire(self, context):
+        """Enter a register context and make its register the live register, releasing the previous one.
+
+        Returns:
+            Qureg: the new live register
+        """
+        _release(self._live_contexts)
+        context.__enter__()
+        self._live_contexts.append(context)
+
+        return context.qureg
+
+    def _run_program(self, operations, qureg):
+        """Apply preprocessed operations to a register with the cached program of the circuit."""
+        program = self._programs.get(operations, self._special_calls, self._qubit_map, self._noise)
+        program.run(qureg, operations)
+
+    def _apply_rotations(self):
+        """Apply the pending basis rotations to the live register.
+
+        Returns:
+            Qureg: the live register or ``None`` if the device holds no state
+        """
+        if not self._rotated:
+            self._rotated = True
+
+            if self._rotations:
+                self._run_program(self._rotations, self._qureg)
+
+        return self._qureg
+
+    def _native_terms(self, observable):
+        if not self.analytic or not self._native_expectations or self._qureg is None:
+            return None
+
+        if self._rotated and self._rotations:
+            return None
+
+        return pauli_terms(observable)
+
+    def _expec_pauli_sum(self, terms):
+        if not terms:
+            return 0.0
+
+        qureg = self._qureg
+        num_qubits = qureg.numQubitsRepresented
+        terms = self._map_terms(terms)
+
+        # the workspace is as large as the live register, keeping it idle in the pool
+        # would double the memory of the device for the rest of its lifetime
+        workspace = quest_env.create_qureg(num_qubits, density=bool(qureg.isDensityMatrix))
+
+        try:
+            if len(terms) == 1:
+                coeff, word = terms[0]
+                expec = pqc.cheat.calcExpecPauliProd()(qureg, list(word), list(word.values()), workspace)
+
+                return coeff * expec
+
+            paulis, coefficients = pauli_codes(terms, num_qubits)
 
-            all_operations = operations + rotations if rotations else operations
+            return pqc.cheat.calcExpecPauliSum()(qureg, paulis, coefficients, workspace)
+        finally:
+            quest_env.destroy_qureg(workspace)
 
-            all_operations = self._preprocess_operations(all_operations)
+    def expval(self, observable):
+        terms = self._native_terms(observable)
 
-            for operation in all_operations:
-                if operation.name == "QubitStateVector":
-                    self._init_state_vector(operation.parameters[0], context)
-                elif operation.name == "BasisState":
-                    state_int = int("".join(str(x) for x in reversed(operation.parameters[0])), 2)
-                    pqc.cheat.initClassicalState()(context.qureg, state=state_int)
-                else:
-                    _OPERATIONS[operation.name].apply(operation, context.qureg)
+        if terms is None:
+            return super().expval(observable)
 
-            self._extract_information(context)
+        return self._expec_pauli_sum(terms)
+
+    def var(self, observable):
+        terms = self._native_terms(observable)
+
+        if terms is None:
+            return super().var(observable)
+
+        mean = self._expec_pauli_sum(terms)
+
+        if len(terms) == 1:
+            # Pauli words square to the identity
+            return terms[0][0] ** 2 - mean ** 2
+
+        return self._expec_pauli_sum(square_terms(terms)) - mean ** 2
+
+    def statistics(self, observables):
+        if not all(obs.return_type in (Expectation, Variance) for obs in observables):
+            return super().statistics(observables)
+
+        # evaluate the native observables first, as the others rotate the register
+        order = sorted(range(len(observables)), key=lambda idx: self._native_terms(observables[idx]) is None)
+
+        results = [None] * len(observables)
+        for idx in order:
+            obs = observables[idx]
+            results[idx] = self.expval(obs) if obs.return_type is Expectation else self.var(obs)
+
+        return results
 
     def analytic_probability(self, wires=None):
         """Return the (marginal) analytic probability of each computational basis state."""
         if self._probs is None:
-            return None
+            qureg = self._apply_rotations()
+
+            if qureg is None:
+                return None
+
+            if self._reduced:
+                return self._light_cone_probability(qureg, wires)
+
+            if wires is not None and len(wires) < self.num_wires:
+                # QuEST orders the outcomes with the first qubit as least significant bit
+                prob = marginal_probabilities(qureg, self._map_wires(reversed(Wires(wires).labels)))
+
+                if prob is not None:
+                    return prob
+
+            self._probs = self._extract_probabilities(qureg)
 
         wires = wires or range(self.num_wires)
 
         prob = self.marginal_prob(self._probs, wires)
         return prob
+
+    def _light_cone_probability(self, qureg, wires):
+        """Return the marginal probability of wires simulated on a register of the light cone."""
+        wires = Wires(wires) if wires is not None else self.wires
+        prob = marginal_probabilities(qureg, self._map_wires(reversed(wires.labels)))
+
+        if prob is None:
+            prob = self._simulated_marginal(self._extract_probabilities(qureg), wires)
+
+        return prob
+
+    def _simulated_marginal(self, probs, wires=None):
+        """Return the marginal probability of wires from the extracted probabilities of the live register."""
+        if not self._reduced:
+            return self.marginal_prob(probs, wires)
+
+        # the extracted probabilities are ordered like the simulated wires
+        wires = Wires(wires) if wires is not None else self.wires
+        simulated = sorted(self._qubit_map)
+        axes = [simulated.index(wire) for wire in wires.labels]
+        prob = probs.reshape([2] * len(simulated))
+        prob = np.sum(prob, axis=tuple(axis for axis in range(len(simulated)) if axis not in axes))
+
+        return np.transpose(prob, np.argsort(np.argsort(axes))).ravel()
+
+
+def _layout(wires, native):
+    """Map the given wires to the qubits of a register that holds just them."""
+    wires = list(wires)
+
+    if native:
+        # the first wire is the most significant qubit, as in PennyLane
+        return {wire: len(wires) - 1 - qubit for qubit, wire in enumerate(wires)}
+
+    return {wire: qubit for qubit, wire in enumerate(wires)}
+
+
+def _measured_wires(circuit):
+    """Return the wires a circuit measures, or ``None`` if it measures the whole state."""
+    wires = set()
+
+    for observable in circuit.observables:
+        if observable.return_type is State or not observable.wires:
+            return None
+
+        wires.update(observable.wires.labels)
+
+    return wires
+
+
+def _structure(circuit):
+    """Return a key that is shared by circuits which only differ in the values of their parameters."""
+    operations = tuple((operation.name, operation.wires.labels) for operation in circuit.operations)
+    observables = tuple(
+        (observable.return_type, str(observable.name), observable.wires.labels)
+        for observable in circuit.observables
+    )
+
+    return operations, observables
+
+
+def _collect(results, indices):
+    """Move the results of a group of circuits into the rows of one array if their shapes agree."""
+    first = results[indices[0]]
+
+    if not isinstance(first, np.ndarray):
+        return
+
+    for idx in indices:
+        res = results[idx]
+
+        if not isinstance(res, np.ndarray) or res.shape != first.shape or res.dtype != first.dtype:
+            return
+
+    out = np.empty((len(indices),) + first.shape, dtype=first.dtype)
+
+    for row, idx in enumerate(indices):
+        out[row] = results[idx]
+        results[idx] = out[row]
+
+
+class _WorkerPool:
+    """Threads that execute circuits on copies of a device.
+
+    The copies are created on first use and created again once the settings of the device
+    changed, see ``PyquestDevice._worker_key``. Every thread takes an idle copy for each
+    circuit, so that no two threads share registers or caches. The threads split the cores given by
+    ``OMP_NUM_THREADS``, or all cores, among them for the OpenMP parallelism of QuEST.
+
+    Args:
+        max_workers (int): the number of threads
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._devices = []
+        self._idle = queue.SimpleQueue()
+        self._key = None
+
+    def map(self, device, fn, items):
+        """Apply ``fn(worker_device, item)`` to all items concurrently.
+
+        Args:
+            device (PyquestDevice): the device the worker copies are made from
+            fn (callable): the function applied to a worker copy and an item
+            items (list): the items
+
+        Returns:
+            list: the results in the order of the items
+        """
+        key = device._worker_key()
+
+        if self._devices and key != self._key:
+            self._close_devices()
+
+        if not self._devices:
+            self._devices = [device._make_worker() for _ in range(self.max_workers)]
+            for worker in self._devices:
+                self._idle.put(worker)
+
+            self._key = key
+
+        if self._executor is None:
+            budget = int(os.environ.get("OMP_NUM_THREADS", 0)) or os.cpu_count() or 1
+            threads = max(1, budget // self.max_workers)
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, initializer=quest_env.set_num_threads, initargs=(threads,)
+            )
+
+        def run(item):
+            worker = self._idle.get()
+
+            try:
+                return fn(worker, item)
+            finally:
+                self._idle.put(worker)
+
+        return list(self._executor.map(run, items))
+
+    def close(self):
+        """Stop the threads and destroy the registers of the worker copies."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        self._close_devices()
+
+    def _close_devices(self):
+        for worker in self._devices:
+            worker.close()
+
+        self._devices = []
+        self._idle = queue.SimpleQueue()
+        self._key = None
+
+
+def _release(contexts):
+    while contexts:
+        contexts.pop().__exit__(None, None, None)
+
+
+def _release_and_close(pool, contexts, workers):
+    if workers is not None:
+        workers.close()
+
+    _release(contexts)
+    pool.close()
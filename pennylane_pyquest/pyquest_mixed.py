@@ -34,29 +34,102 @@ Classes
 
 .. autosummary::
    PyquestMixed
+   ErrorModelCache
 
 ----
 """
+from collections import OrderedDict
+
 import numpy as np
 import pyquest_cffi as pqc
+from pennylane.operation import Expectation, Probability, Variance
 
+from .noise import CHANNELS
 from .pyquest_device import PyquestDevice
-from .utils import reorder_matrix, reorder_state
+from .trajectories import trajectory_calls
+from .utils import density_diagonal, marginal_probabilities, read_probabilities, reorder_matrix, reorder_state
+
+
+def _parameter_key(parameter):
+    if isinstance(parameter, np.ndarray):
+        return (parameter.shape, parameter.dtype.str, parameter.tobytes())
+
+    return parameter
+
+
+class ErrorModelCache:
+    """Least recently used cache of the operations an error model adds after an operation.
+
+    The error model is assumed to depend only on the name, the wires and the parameters
+    of the operation it is called with.
+
+    Args:
+        error_model (operation->list[operation]): the error model whose output is cached
+        max_size (int): the maximal number of entries kept in the cache, 0 disables caching
+    """
+
+    def __init__(self, error_model, max_size=0):
+        if max_size < 0:
+            raise ValueError("The maximal error model cache size must be non-negative, got {}.".format(max_size))
+
+        self.error_model = error_model
+        self.max_size = max_size
+        self._errors = OrderedDict()
+
+    def __len__(self):
+        return len(self._errors)
+
+    @staticmethod
+    def key(operation):
+        """Return the cache key of an operation.
+
+        Args:
+            operation (~.Operation): the operation
+
+        Returns:
+            tuple: the name, wires and parameters of the operation
+        """
+        return (
+            operation.name,
+            operation.wires.labels,
+            tuple(_parameter_key(parameter) for parameter in operation.parameters),
+        )
+
+    def __call__(self, operation):
+        """Return the operations the error model adds after an operation.
+
+        Args:
+            operation (~.Operation): the operation
 
+        Returns:
+            list[~.Operation]: the error operations
+        """
+        if not self.max_size:
+            return self.error_model(operation)
+
+        key = self.key(operation)
+
+        try:
+            errors = self._errors.get(key)
+        except TypeError:
+            # unhashable parameters are not cached
+            return self.error_model(operation)
 
-class DensityQuregContext:
-    def __init__(self, wires):
-        self.wires = wires
+        if errors is not None:
+            self._errors.move_to_end(key)
+            return errors
 
-    def __enter__(self):
-        self.env = pqc.utils.createQuestEnv()()
-        self.qureg = pqc.utils.createDensityQureg()(self.wires, env=self.env)
+        errors = list(self.error_model(operation))
+        self._errors[key] = errors
 
-        return self
+        if len(self._errors) > self.max_size:
+            self._errors.popitem(last=False)
 
-    def __exit__(self, etype, value, traceback):
-        pqc.utils.destroyQureg()(self.qureg, env=self.env)
-        pqc.utils.destroyQuestEnv()(self.env)
+        return errors
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        self._errors.clear()
 
 
 class PyquestMixed(PyquestDevice):
@@ -66,6 +139,7 @@ class PyquestMixed(PyquestDevice):
         "BasisState",
         "QubitStateVector",
         "QubitUnitary",
+        "DiagonalQubitUnitary",
         "PauliX",
         "PauliY",
         "PauliZ",
@@ -90,55 +164,340 @@ class PyquestMixed(PyquestDevice):
         "MixKrausMap",
     }
 
-    def __init__(self, wires, *, shots=1000, analytic=True, error_model=None):
+    def __init__(
+        self,
+        wires,
+        *,
+        error_model=None,
+        error_model_cache_size=0,
+        noise_model=None,
+        trajectories=None,
+        seed=None,
+        pure_fallback=True,
+        hybrid_execution=True,
+        **kwargs
+    ):
         """
         Args:
             error_model(operation->list[operation]): A function that is called for every operation in the 
                 queue and returns a list of operations that represent additional errors.
+            error_model_cache_size (int): the maximal number of error model outputs that are cached,
+                keyed by the name, wires and parameters of the operation. 0 disables caching, which
+                is required if the error model is not a function of these alone.
+            noise_model (NoiseModel): a declarative noise model that is compiled into the
+                programs of the device. It acts on the gates as they are submitted, so it can not
+                be combined with the options that rewrite the circuit.
+            trajectories (int): if given, the device simulates this many quantum trajectories on
+                state vector registers instead of a density matrix. The channels are applied by
+                sampling one of their Kraus operators and the measured probabilities are averaged
+                over the trajectories. The standard errors of the results are available as
+                :attr:`standard_error`.
+            seed (int): the seed of the random numbers drawn for the trajectories
+            pure_fallback (bool): whether circuits without any channel are simulated on a state
+                vector register, the density matrix is then only formed if it is accessed
+            hybrid_execution (bool): whether the gates before the first channel of a circuit are
+                simulated on a state vector register, which is then converted to a density matrix
         """
-        super().__init__(wires, shots=shots, analytic=analytic)
+        if trajectories is not None and trajectories < 1:
+            raise ValueError("The number of trajectories must be positive, got {}.".format(trajectories))
 
-        self.error_model = error_model
+        # the sampled channels are created with the special calls
+        self._trajectories = trajectories
+        self._rng = np.random.default_rng(seed)
+        self._trajectory_observables = None
+        self._standard_error = None
+        self.pure_fallback = pure_fallback
+        self.hybrid_execution = hybrid_execution
+
+        super().__init__(wires, **kwargs)
 
-    def reset(self):
-        super().reset()
+        self._error_model_cache = ErrorModelCache(error_model, error_model_cache_size)
+        self._noise_model = noise_model
 
+        if noise_model is not None:
+            if self._passes:
+                raise ValueError("A noise model can not be combined with gate optimizations or fusion.")
+
+            self._noise = noise_model.compile(self._special_calls)
+
+    @property
+    def trajectories(self):
+        """int: the number of trajectories averaged per execution, ``None`` if the density matrix
+        is simulated, fixed when the device is created as the compiled programs depend on it"""
+        return self._trajectories
+
+    @property
+    def noise_model(self):
+        """NoiseModel: the noise model of the device"""
+        return self._noise_model
+
+    @property
+    def error_model(self):
+        """operation->list[operation]: the error model of the device"""
+        return self._error_model_cache.error_model
+
+    @error_model.setter
+    def error_model(self, error_model):
+        self._error_model_cache.error_model = error_model
+        self._error_model_cache.clear()
+
+    @property
+    def standard_error(self):
+        """array[float]: the standard errors of the results of the last execution in trajectory
+        mode, shaped like the results, or ``None``. Samples have no standard error."""
+        return self._standard_error
+
+    def _make_special_calls(self):
+        special_calls = super()._make_special_calls()
+
+        if self.trajectories:
+            special_calls.update(trajectory_calls(self._rng, self._pool))
+
+        return special_calls
+
+    def _worker_key(self):
+        return super()._worker_key() + (
+            self.error_model,
+            self.pure_fallback,
+            self.hybrid_execution,
+        )
+
+    def _make_worker(self):
+        worker = super()._make_worker()
+
+        # every worker draws its own trajectories, seeded from the random numbers of the device
+        worker._rng = np.random.default_rng(self._rng.integers(2 ** 63))
+        worker._special_calls = worker._make_special_calls()
+        worker._error_model_cache = ErrorModelCache(self.error_model, self._error_model_cache.max_size)
+        worker._standard_error = None
+
+        if self._noise_model is not None:
+            worker._noise = self._noise_model.compile(worker._special_calls)
+
+        return worker
+
+    def _clear_information(self):
         self._density_matrix = None
         self._probs = None
 
-    def _qureg_context(self):
-        return DensityQuregContext(self.num_wires)
-
-    def _init_state_vector(self, state, context):
-        state = reorder_state(state)
-        matrix = np.outer(state.conj(), state).ravel()
-        pqc.cheat.setDensityAmps()(
-            qureg=context.qureg,
-            startind=0,
-            reals=np.real(matrix),
-            imags=np.imag(matrix),
-            numamps=len(matrix),
-        )
+    def _qureg_context(self, num_qubits, density=None):
+        if density is None:
+            density = not self.trajectories
+
+        return self._pool.context(num_qubits, density=density)
+
+    def _first_channel(self, operations):
+        """int: the index of the first of the preprocessed operations that applies a channel,
+        or the number of operations if none does"""
+        noise = self._noise
+
+        for idx, operation in enumerate(operations):
+            if operation.name in CHANNELS or (noise is not None and noise(operation.name, operation.wires.labels)):
+                return idx
+
+        return len(operations)
+
+    def _simulate(self, operations, num_qubits):
+        if self.trajectories:
+            super()._simulate(operations, num_qubits)
+            return
+
+        prefix = self._first_channel(operations)
+        noiseless = prefix == len(operations) and self._first_channel(self._rotations) == len(self._rotations)
+
+        if noiseless and self.pure_fallback:
+            # without noise the state stays pure, a state vector needs 2^n instead of 4^n amplitudes
+            qureg = self._acquire(self._qureg_context(num_qubits, density=False))
+            pqc.cheat.initZeroState()(qureg=qureg)
+            self._run_program(operations, qureg)
+            return
+
+        if not self.hybrid_execution or prefix == 0:
+            super()._simulate(operations, num_qubits)
+            return
+
+        # the gates before the first channel are applied to a state vector, whose density
+        # matrix is then formed by QuEST to continue with the channels
+        with self._pool.context(num_qubits) as pure:
+            pqc.cheat.initZeroState()(qureg=pure.qureg)
+            self._run_program(operations[:prefix], pure.qureg)
+
+            qureg = self._acquire(self._qureg_context(num_qubits, density=True))
+            pqc.cheat.initPureState()(qureg, pure.qureg)
+
+        self._run_program(operations[prefix:], qureg)
+
+    @staticmethod
+    def _init_state_vector(qureg, state, reorder=True, pool=None):
+        if reorder:
+            state = reorder_state(state)
+
+        if not qureg.isDensityMatrix:
+            pqc.cheat.initStateFromAmps()(qureg, reals=np.real(state), imags=np.imag(state))
+            return
+
+        if pool is None:
+            matrix = np.outer(state.conj(), state).ravel()
+            pqc.cheat.setDensityAmps()(
+                qureg=qureg,
+                startind=0,
+                reals=np.real(matrix),
+                imags=np.imag(matrix),
+                numamps=len(matrix),
+            )
+            return
+
+        # the outer product is formed by QuEST from a state vector register
+        with pool.context(qureg.numQubitsRepresented) as pure:
+            pqc.cheat.initStateFromAmps()(pure.qureg, reals=np.real(state), imags=np.imag(state))
+            pqc.cheat.initPureState()(qureg, pure.qureg)
 
     def _preprocess_operations(self, operations):
         if not self.error_model:
-            return operations
+            return super()._preprocess_operations(operations)
 
         out = []
         for op in operations:
             out.append(op)
-            out = out + self.error_model(op)
+            out.extend(self._error_model_cache(op))
+
+        return super()._preprocess_operations(out)
+
+    def execute(self, circuit, **kwargs):
+        if not self.trajectories:
+            return super().execute(circuit, **kwargs)
+
+        self._trajectory_observables = circuit.observables
+
+        try:
+            return super().execute(circuit, **kwargs)
+        finally:
+            self._trajectory_observables = None
+
+    def apply(self, operations, rotations=None, **kwargs):
+        if not self.trajectories:
+            super().apply(operations, rotations, **kwargs)
+            return
+
+        observables = self._trajectory_observables or []
+        values = [[] for _ in observables]
+        probs = 0
+
+        for _ in range(self.trajectories):
+            super().apply(operations, rotations, **kwargs)
+            self._probs = self._extract_probabilities(self._apply_rotations())
+
+            for observable, trajectory_values in zip(observables, values):
+                trajectory_values.append(self._trajectory_values(observable))
+
+            probs = probs + self._probs
+
+        # the averaged probabilities are the diagonal of the density matrix
+        self._probs = probs / self.trajectories
+        errors = [_standard_error(observable, samples) for observable, samples in zip(observables, values)]
+
+        if len({np.shape(error) for error in errors}) <= 1:
+            self._standard_error = self._asarray(errors)
+        else:
+            # results of different shapes, like expectation values and probabilities
+            self._standard_error = np.empty(len(errors), dtype=object)
+            self._standard_error[:] = errors
+
+    def _trajectory_values(self, observable):
+        """Return the quantities of a trajectory the standard error of a result is estimated from."""
+        if observable.return_type is Probability:
+            return self.analytic_probability(observable.wires)
+
+        if observable.return_type in (Expectation, Variance):
+            eigvals = observable.eigvals
+            prob = self.analytic_probability(observable.wires)
+
+            return np.dot(eigvals, prob), np.dot(eigvals ** 2, prob)
+
+        return None
 
-        return out
+    def analytic_probability(self, wires=None):
+        if not self.trajectories:
+            return super().analytic_probability(wires)
 
-    def _extract_information(self, context):
-        self._density_matrix = reorder_matrix(pqc.cheat.getDensityMatrix()(context.qureg))
-        self._probs = np.real(np.diag(self._density_matrix))
+        if self._probs is None:
+            return None
+
+        return self._simulated_marginal(self._probs, wires)
+
+    def _extract_probabilities(self, qureg):
+        if self._density_matrix is not None:
+            return np.real(np.diag(self._density_matrix))
+
+        # only the diagonal is read, the density matrix is transferred if it is accessed
+        simulated = sorted(self._qubit_map) if self._qubit_map is not None else range(self.num_wires)
+        probs = marginal_probabilities(qureg, self._map_wires(reversed(simulated)))
+
+        if probs is not None:
+            return probs
+
+        if qureg.isDensityMatrix:
+            probs = density_diagonal(qureg)
+
+            if probs is None:
+                probs = np.real(np.diag(pqc.cheat.getDensityMatrix()(qureg)))
+        else:
+            probs = read_probabilities(qureg, reorder=not self.native_layout)
+
+            if probs is not None:
+                return probs
+
+            probs = np.abs(pqc.cheat.getStateVector()(qureg)) ** 2
+
+        return probs if self.native_layout else reorder_state(probs)
+
+    def _read_density_matrix(self, qureg):
+        if not qureg.isDensityMatrix:
+            state = pqc.cheat.getStateVector()(qureg)
+            state = state if self.native_layout else reorder_state(state)
+
+            return np.outer(state, state.conj())
+
+        matrix = pqc.cheat.getDensityMatrix()(qureg)
+
+        return matrix if self.native_layout else reorder_matrix(matrix)
+
+    @property
+    def _native_expectations(self):
+        # the error and noise models also act on the basis rotations, and in trajectory
+        # mode the register only holds the last trajectory
+        return self.error_model is None and self._noise_model is None and not self.trajectories
 
     @property
     def state(self):
-        return self._density_matrix
+        return self.density_matrix
 
     @property
     def density_matrix(self):
+        if self._density_matrix is None and not self._reduced and not self.trajectories:
+            qureg = self._apply_rotations()
+
+            if qureg is not None:
+                self._density_matrix = self._read_density_matrix(qureg)
+
         return self._density_matrix
+
+
+def _standard_error(observable, samples):
+    """Return the standard error of a result averaged over trajectories."""
+    if observable.return_type is Probability:
+        samples = np.array(samples)
+    elif observable.return_type is Expectation:
+        samples = np.array([mean for mean, _ in samples])
+    elif observable.return_type is Variance:
+        means = np.array([mean for mean, _ in samples])
+        squares = np.array([square for _, square in samples])
+        # the variance is a function of both averages, its error is linearized around them
+        samples = squares - 2 * np.mean(means) * means
+    else:
+        return np.nan
+
+    if len(samples) < 2:
+        return np.full(samples.shape[1:], np.nan)
+
+    return np.std(samples, axis=0, ddof=1) / np.sqrt(len(samples))
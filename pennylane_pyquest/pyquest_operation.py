@@ -6,13 +6,12 @@
 
 #     http://www.apache.org/licenses/LICENSE-2.0
 
-import pennylane as qml
-
 # Unless required by applicable law or agreed to in writing, software
 # distributed under the License is distributed on an "AS IS" BASIS,
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import numpy as np
 import pyquest_cffi as pqc
 
 from .utils import reorder_matrix
@@ -29,166 +28,196 @@ def _pauli_to_int(paulis):
 
 
 class PyquestOperation:
-    def __init__(self, converter):
-        # Takes a PL operation and makes a function that applies said function to a qreg
-        self.converter = converter
+    """Applies PennyLane operations of one type with a pyquest-cffi kernel.
+
+    The kernel is instantiated once when the dispatch table is built. The wires of the
+    operation are passed as separate arguments (``qubit`` or ``control, qubit``) or, if
+    ``wire_list`` is set, as a single list (``targets`` or ``qubits``). The parameters follow
+    in the order of the PennyLane operation unless ``params`` maps them to the kernel arguments.
+
+    Args:
+        kernel (type): the pyquest-cffi kernel class, e.g. ``pqc.ops.rotateX``
+        wire_list (bool): whether the kernel takes all wires as a single list
+        params (callable): maps the parameters of the operation to a tuple of kernel arguments
+        reverse_wires (bool): whether the list of wires is passed in reversed order
+    """
+
+    def __init__(self, kernel, wire_list=False, params=None, reverse_wires=False):
+        self.kernel = kernel()
+        self.wire_list = wire_list
+        self.params = params
+        self.reverse_wires = reverse_wires
+        self.call = self._make_call(self.kernel.call_interactive, wire_list, params, reverse_wires)
+
+    @staticmethod
+    def _make_call(fn, wire_list, params, reverse_wires=False):
+        # the variants avoid any branching in the hot path
+        if wire_list and reverse_wires:
+
+            def call(qureg, wires, parameters):
+                fn(qureg, list(reversed(wires)), *params(parameters))
+
+        elif wire_list and params:
+
+            def call(qureg, wires, parameters):
+                fn(qureg, list(wires), *params(parameters))
+
+        elif wire_list:
+
+            def call(qureg, wires, parameters):
+                fn(qureg, list(wires), *parameters)
+
+        elif params:
+
+            def call(qureg, wires, parameters):
+                fn(qureg, *wires, *params(parameters))
+
+        else:
+
+            def call(qureg, wires, parameters):
+                fn(qureg, *wires, *parameters)
+
+        return call
 
     def apply(self, operation, qureg):
-        self.converter(operation, qureg)
+        """Apply a PennyLane operation to a register.
+
+        Args:
+            operation (~.Operation): the operation to apply
+            qureg (Qureg): the register the operation is applied to
+        """
+        self.call(qureg, operation.wires.labels, operation.parameters)
+
+
+def _reordered_matrix(parameters):
+    return (reorder_matrix(parameters[0]),)
+
+
+def _diagonal_matrix(parameters):
+    return (reorder_matrix(np.diag(parameters[0])),)
+
+
+def _adjoint_diagonal_matrix(parameters):
+    return (reorder_matrix(np.diag(np.conj(parameters[0]))),)
+
+
+def _matrix(parameters):
+    return (np.asarray(parameters[0]),)
+
+
+def _diagonal(parameters):
+    return (np.diag(parameters[0]),)
+
+
+def _adjoint(parameters):
+    return (np.conj(parameters[0]).T,)
+
+
+def _adjoint_diagonal(parameters):
+    return (np.diag(np.conj(parameters[0])),)
+
+
+def _pauli_rotation(parameters):
+    return _pauli_to_int(parameters[1]), parameters[0]
+
+
+def _negated(parameters):
+    return (-parameters[0],)
+
+
+def _adjoint_matrix(parameters):
+    return (reorder_matrix(np.conj(parameters[0]).T),)
+
+
+def _inverse_pauli_rotation(parameters):
+    return _pauli_to_int(parameters[1]), -parameters[0]
+
+
+def _inverse_name(name):
+    """Return the name of the inverse of an operation, e.g. ``RX.inv`` for ``RX``."""
+    return name[: -len(".inv")] if name.endswith(".inv") else name + ".inv"
 
 
 _OPERATIONS = {
-    "Hadamard": PyquestOperation(
-        lambda op, qureg: pqc.ops.hadamard()(qureg=qureg, qubit=op.wires.toarray()[0])
-    ),
-    "PauliX": PyquestOperation(lambda op, qureg: pqc.ops.pauliX()(qureg=qureg, qubit=op.wires.toarray()[0])),
-    "PauliY": PyquestOperation(lambda op, qureg: pqc.ops.pauliY()(qureg=qureg, qubit=op.wires.toarray()[0])),
-    "PauliZ": PyquestOperation(lambda op, qureg: pqc.ops.pauliZ()(qureg=qureg, qubit=op.wires.toarray()[0])),
-    "S": PyquestOperation(lambda op, qureg: pqc.ops.sGate()(qureg=qureg, qubit=op.wires.toarray()[0])),
-    "T": PyquestOperation(lambda op, qureg: pqc.ops.tGate()(qureg=qureg, qubit=op.wires.toarray()[0])),
-    "CompactUnitary": PyquestOperation(
-        lambda op, qureg: pqc.ops.compactUnitary()(
-            qureg=qureg, qubit=op.wires.toarray()[0], alpha=op.parameters[0], beta=op.parameters[1],
-        )
-    ),  # Custom
-    "PhaseShift": PyquestOperation(
-        lambda op, qureg: pqc.ops.phaseShift()(
-            qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0]
-        )
-    ),
-    "RotateAroundAxis": PyquestOperation(
-        lambda op, qureg: pqc.ops.rotateAroundAxis()(
-            qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0], vector=op.parameters[1],
-        )
-    ),  # Custom
-    "RotateAroundSphericalAxis": PyquestOperation(
-        lambda op, qureg: pqc.ops.rotateAroundAxis()(
-            qureg=qureg,
-            qubit=op.wires.toarray()[0],
-            theta=op.parameters[0],
-            spherical_theta=op.parameters[1],
-            spherical_phi=[2],
-        )
-    ),  # Custom
-    "RX": PyquestOperation(
-        lambda op, qureg: pqc.ops.rotateX()(qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0])
-    ),
-    "RY": PyquestOperation(
-        lambda op, qureg: pqc.ops.rotateY()(qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0])
-    ),
-    "RZ": PyquestOperation(
-        lambda op, qureg: pqc.ops.rotateZ()(qureg=qureg, qubit=op.wires.toarray()[0], theta=op.parameters[0])
-    ),
-    "QubitUnitary": PyquestOperation(
-        lambda op, qureg: pqc.ops.multiQubitUnitary()(
-            qureg=qureg, targets=op.wires.toarray(), matrix=reorder_matrix(op.parameters[0])
-        )
-    ),
-    "ControlledCompactUnitary": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledCompactUnitary()(
-            qureg=qureg,
-            control=op.wires.toarray()[0],
-            qubit=op.wires.toarray()[1],
-            alpha=op.parameters[0],
-            beta=op.parameters[1],
-        )
-    ),  # Custom
-    "CNOT": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledNot()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],
-        )
-    ),
-    "CY": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledPauliY()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],
-        )
-    ),  # Custom
-    "CZ": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledPhaseFlip()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],
-        )
-    ),
-    "SWAP": PyquestOperation(
-        lambda op, qureg: pqc.ops.swapGate()(qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],)
-    ),
-    "SqrtSWAP": PyquestOperation(
-        lambda op, qureg: pqc.ops.sqrtSwapGate()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],
-        )
-    ),  # Custom
-    "SqrtISWAP": PyquestOperation(
-        lambda op, qureg: pqc.ops.sqrtISwap()(qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],)
-    ),  # Custom
-    "InvSqrtISWAP": PyquestOperation(
-        lambda op, qureg: pqc.ops.invSqrtISwap()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1],
-        )
-    ),  # Custom
-    "ControlledPhaseShift": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledPhaseShift()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], theta=op.parameters[0],
-        )
-    ),  # Custom
-    "ControlledRotateAroundAxis": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledRotateAroundAxis()(
-            qureg=qureg,
-            control=op.wires.toarray()[0],
-            qubit=op.wires.toarray()[1],
-            theta=op.parameters[0],
-            vector=op.parameters[1],
-        )
-    ),  # Custom
-    "CRX": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledRotateX()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], theta=op.parameters[0],
-        )
-    ),
-    "CRY": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledRotateY()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], theta=op.parameters[0],
-        )
-    ),
-    "CRZ": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledRotateZ()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], theta=op.parameters[0],
-        )
-    ),
-    "ControlledUnitary": PyquestOperation(
-        lambda op, qureg: pqc.ops.controlledUnitary()(
-            qureg=qureg, control=op.wires.toarray()[0], qubit=op.wires.toarray()[1], matrix=reorder_matrix(op.parameters[0]),
-        )
-    ),  # Custom
-    "MultiRZ": PyquestOperation(
-        lambda op, qureg: pqc.ops.multiRotateZ()(
-            qureg=qureg, qubits=op.wires.toarray(), angle=op.parameters[0],
-        )
-    ),
-    "PauliRot": PyquestOperation(
-        lambda op, qureg: pqc.ops.multiRotatePauli()(
-            qureg=qureg,
-            qubits=op.wires.toarray(),
-            paulis=_pauli_to_int(op.parameters[1]),
-            angle=op.parameters[0],
-        )
-    ),
-    "MixDephasing": PyquestOperation(
-        lambda op, qureg: pqc.ops.mixDephasing()(
-            qureg=qureg, qubit=op.wires.toarray()[0], probability=op.parameters[0],
-        )
-    ),
-    "MixDepolarising": PyquestOperation(
-        lambda op, qureg: pqc.ops.mixDepolarising()(
-            qureg=qureg, qubit=op.wires.toarray()[0], probability=op.parameters[0],
-        )
-    ),
-    "MixDamping": PyquestOperation(
-        lambda op, qureg: pqc.ops.mixDamping()(
-            qureg=qureg, qubit=op.wires.toarray()[0], probability=op.parameters[0],
-        )
-    ),
-    "MixKrausMap": PyquestOperation(
-        lambda op, qureg: pqc.ops.mixKrausMap()(
-            qureg=qureg, qubit=op.wires.toarray()[0], operators=op.parameters[0],
-        )
+    "Hadamard": PyquestOperation(pqc.ops.hadamard),
+    "PauliX": PyquestOperation(pqc.ops.pauliX),
+    "PauliY": PyquestOperation(pqc.ops.pauliY),
+    "PauliZ": PyquestOperation(pqc.ops.pauliZ),
+    "S": PyquestOperation(pqc.ops.sGate),
+    "T": PyquestOperation(pqc.ops.tGate),
+    "CompactUnitary": PyquestOperation(pqc.ops.compactUnitary),  # Custom
+    "PhaseShift": PyquestOperation(pqc.ops.phaseShift),
+    "RotateAroundAxis": PyquestOperation(pqc.ops.rotateAroundAxis),  # Custom
+    "RotateAroundSphericalAxis": PyquestOperation(pqc.ops.rotateAroundSphericalAxis),  # Custom
+    "RX": PyquestOperation(pqc.ops.rotateX),
+    "RY": PyquestOperation(pqc.ops.rotateY),
+    "RZ": PyquestOperation(pqc.ops.rotateZ),
+    "QubitUnitary": PyquestOperation(pqc.ops.multiQubitUnitary, wire_list=True, params=_reordered_matrix),
+    "DiagonalQubitUnitary": PyquestOperation(pqc.ops.multiQubitUnitary, wire_list=True, params=_diagonal_matrix),
+    "ControlledCompactUnitary": PyquestOperation(pqc.ops.controlledCompactUnitary),  # Custom
+    "CNOT": PyquestOperation(pqc.ops.controlledNot),
+    "CY": PyquestOperation(pqc.ops.controlledPauliY),  # Custom
+    "CZ": PyquestOperation(pqc.ops.controlledPhaseFlip),
+    "SWAP": PyquestOperation(pqc.ops.swapGate),
+    "SqrtSWAP": PyquestOperation(pqc.ops.sqrtSwapGate),  # Custom
+    "SqrtISWAP": PyquestOperation(pqc.ops.sqrtISwap),  # Custom
+    "InvSqrtISWAP": PyquestOperation(pqc.ops.invSqrtISwap),  # Custom
+    "ControlledPhaseShift": PyquestOperation(pqc.ops.controlledPhaseShift),  # Custom
+    "ControlledRotateAroundAxis": PyquestOperation(pqc.ops.controlledRotateAroundAxis),  # Custom
+    "CRX": PyquestOperation(pqc.ops.controlledRotateX),
+    "CRY": PyquestOperation(pqc.ops.controlledRotateY),
+    "CRZ": PyquestOperation(pqc.ops.controlledRotateZ),
+    "ControlledUnitary": PyquestOperation(pqc.ops.controlledUnitary, params=_reordered_matrix),  # Custom
+    "MultiRZ": PyquestOperation(pqc.ops.multiRotateZ, wire_list=True),
+    "PauliRot": PyquestOperation(pqc.ops.multiRotatePauli, wire_list=True, params=_pauli_rotation),
+    "MixDephasing": PyquestOperation(pqc.ops.mixDephasing),
+    "MixDepolarising": PyquestOperation(pqc.ops.mixDepolarising),
+    "MixDamping": PyquestOperation(pqc.ops.mixDamping),
+    "MixKrausMap": PyquestOperation(pqc.ops.mixKrausMap),
+}
+
+# the inverses are used to walk backwards through a circuit
+_OPERATIONS.update(
+    {
+        "Hadamard.inv": _OPERATIONS["Hadamard"],
+        "PauliX.inv": _OPERATIONS["PauliX"],
+        "PauliY.inv": _OPERATIONS["PauliY"],
+        "PauliZ.inv": _OPERATIONS["PauliZ"],
+        "S.inv": PyquestOperation(pqc.ops.phaseShift, params=lambda parameters: (-np.pi / 2,)),
+        "T.inv": PyquestOperation(pqc.ops.phaseShift, params=lambda parameters: (-np.pi / 4,)),
+        "PhaseShift.inv": PyquestOperation(pqc.ops.phaseShift, params=_negated),
+        "RX.inv": PyquestOperation(pqc.ops.rotateX, params=_negated),
+        "RY.inv": PyquestOperation(pqc.ops.rotateY, params=_negated),
+        "RZ.inv": PyquestOperation(pqc.ops.rotateZ, params=_negated),
+        "QubitUnitary.inv": PyquestOperation(pqc.ops.multiQubitUnitary, wire_list=True, params=_adjoint_matrix),
+        "DiagonalQubitUnitary.inv": PyquestOperation(
+            pqc.ops.multiQubitUnitary, wire_list=True, params=_adjoint_diagonal_matrix
+        ),
+        "CNOT.inv": _OPERATIONS["CNOT"],
+        "CY.inv": _OPERATIONS["CY"],
+        "CZ.inv": _OPERATIONS["CZ"],
+        "SWAP.inv": _OPERATIONS["SWAP"],
+        "ControlledPhaseShift.inv": PyquestOperation(pqc.ops.controlledPhaseShift, params=_negated),
+        "CRX.inv": PyquestOperation(pqc.ops.controlledRotateX, params=_negated),
+        "CRY.inv": PyquestOperation(pqc.ops.controlledRotateY, params=_negated),
+        "CRZ.inv": PyquestOperation(pqc.ops.controlledRotateZ, params=_negated),
+        "MultiRZ.inv": PyquestOperation(pqc.ops.multiRotateZ, wire_list=True, params=_negated),
+        "PauliRot.inv": PyquestOperation(pqc.ops.multiRotatePauli, wire_list=True, params=_inverse_pauli_rotation),
+    }
+)
+
+# If wire w is simulated on qubit n - 1 - w, the first wire is the most significant qubit as
+# in PennyLane. Matrices then need no reordering, only their targets are listed starting with
+# the least significant qubit.
+_NATIVE_LAYOUT_OPERATIONS = {
+    "QubitUnitary": PyquestOperation(pqc.ops.multiQubitUnitary, wire_list=True, params=_matrix, reverse_wires=True),
+    "QubitUnitary.inv": PyquestOperation(
+        pqc.ops.multiQubitUnitary, wire_list=True, params=_adjoint, reverse_wires=True
+    ),
+    "DiagonalQubitUnitary": PyquestOperation(
+        pqc.ops.multiQubitUnitary, wire_list=True, params=_diagonal, reverse_wires=True
+    ),
+    "DiagonalQubitUnitary.inv": PyquestOperation(
+        pqc.ops.multiQubitUnitary, wire_list=True, params=_adjoint_diagonal, reverse_wires=True
     ),
 }
@@ -0,0 +1,172 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compiled programs
+=================
+
+**Module name:** :mod:`pennylane_pyquest.pyquest_program`
+
+.. currentmodule:: pennylane_pyquest.pyquest_program
+
+A list of PennyLane operations is lowered to a flat program of kernel calls once. The
+program only depends on the names and wires of the operations, so a circuit that is executed
+again with different parameters reuses the program and only binds the new parameters.
+
+Classes
+-------
+
+.. autosummary::
+   PyquestProgram
+   ProgramCache
+
+Code details
+~~~~~~~~~~~~
+"""
+from collections import OrderedDict
+
+from .pyquest_operation import _OPERATIONS
+
+
+def _map_wires(operation, wire_map):
+    if wire_map is None:
+        return operation.wires.labels
+
+    return tuple(wire_map[wire] for wire in operation.wires.labels)
+
+
+class PyquestProgram:
+    """A circuit lowered to a flat list of kernel calls.
+
+    Every instruction is a tuple ``(call, wires, slot)``. ``call`` is invoked as
+    ``call(qureg, wires, parameters)``, where ``parameters`` are the parameters of the
+    operation at position ``slot`` of the list the program is run with.
+
+    Args:
+        instructions (list[tuple[callable, tuple, int]]): the instructions of the program
+    """
+
+    def __init__(self, instructions):
+        self.instructions = instructions
+
+    @classmethod
+    def compile(cls, operations, special_calls=None, wire_map=None, noise=None):
+        """Lower a list of operations to a program.
+
+        Args:
+            operations (list[~.Operation]): the operations of the circuit
+            special_calls (dict[str, callable]): calls for operations that are not applied via
+                a kernel of the dispatch table, like state preparations
+            wire_map (dict): maps the wire labels of the operations to the qubits of the
+                register, by default the labels are used as qubit indices
+            noise (callable): maps the name and wire labels of an operation to the instructions
+                ``(call, wires)`` that are inserted after it, see :meth:`.NoiseModel.compile`
+
+        Returns:
+            PyquestProgram: the compiled program
+        """
+        special_calls = special_calls or {}
+        instructions = []
+
+        for slot, operation in enumerate(operations):
+            name = operation.name
+            call = special_calls[name] if name in special_calls else _OPERATIONS[name].call
+            instructions.append((call, _map_wires(operation, wire_map), slot))
+
+            if noise is not None:
+                for error_call, wires in noise(name, operation.wires.labels):
+                    if wire_map is not None:
+                        wires = tuple(wire_map[wire] for wire in wires)
+
+                    instructions.append((error_call, wires, slot))
+
+        return cls(instructions)
+
+    def run(self, qureg, operations):
+        """Apply the program to a register.
+
+        Args:
+            qureg (Qureg): the register the program is applied to
+            operations (list[~.Operation]): operations with the same structure as the compiled
+                ones, their parameters are bound to the program
+        """
+        parameters = [operation.parameters for operation in operations]
+
+        for call, wires, slot in self.instructions:
+            call(qureg, wires, parameters[slot])
+
+
+class ProgramCache:
+    """Least recently used cache of compiled programs, keyed by the names and wires of the operations.
+
+    Args:
+        max_size (int): the maximal number of programs kept in the cache, 0 disables caching
+    """
+
+    def __init__(self, max_size=32):
+        if max_size < 0:
+            raise ValueError("The maximal program cache size must be non-negative, got {}.".format(max_size))
+
+        self.max_size = max_size
+        self._programs = OrderedDict()
+
+    def __len__(self):
+        return len(self._programs)
+
+    @staticmethod
+    def key(operations, wire_map=None):
+        """Return the cache key of a list of operations.
+
+        Args:
+            operations (list[~.Operation]): the operations of the circuit
+            wire_map (dict): see :meth:`PyquestProgram.compile`
+
+        Returns:
+            tuple: the names and qubits of the operations
+        """
+        return tuple((operation.name, _map_wires(operation, wire_map)) for operation in operations)
+
+    def get(self, operations, special_calls=None, wire_map=None, noise=None):
+        """Return the program for a list of operations, compiling it if it is not cached.
+
+        Args:
+            operations (list[~.Operation]): the operations of the circuit
+            special_calls (dict[str, callable]): see :meth:`PyquestProgram.compile`
+            wire_map (dict): see :meth:`PyquestProgram.compile`
+            noise (callable): see :meth:`PyquestProgram.compile`, the cache assumes that it is
+                the same for all calls
+
+        Returns:
+            PyquestProgram: the compiled program
+        """
+        if not self.max_size:
+            return PyquestProgram.compile(operations, special_calls, wire_map, noise)
+
+        key = self.key(operations, wire_map)
+        program = self._programs.get(key)
+
+        if program is not None:
+            self._programs.move_to_end(key)
+            return program
+
+        program = PyquestProgram.compile(operations, special_calls, wire_map, noise)
+        self._programs[key] = program
+
+        if len(self._programs) > self.max_size:
+            self._programs.popitem(last=False)
+
+        return program
+
+    def clear(self):
+        """Remove all programs from the cache."""
+        self._programs.clear()
@@ -41,24 +41,13 @@ Classes
 # we always import NumPy directly
 import numpy as np
 import pyquest_cffi as pqc
+from pennylane.operation import Expectation
+from pennylane.tape import QubitParamShiftTape
 
+from .pauli import generator_terms, pauli_codes, pauli_terms
 from .pyquest_device import PyquestDevice
-from .utils import reorder_state
-
-
-class QuregContext:
-    def __init__(self, wires):
-        self.wires = wires
-
-    def __enter__(self):
-        self.env = pqc.utils.createQuestEnv()()
-        self.qureg = pqc.utils.createQureg()(self.wires, env=self.env)
-
-        return self
-
-    def __exit__(self, etype, value, traceback):
-        pqc.utils.destroyQureg()(self.qureg, env=self.env)
-        pqc.utils.destroyQuestEnv()(self.env)
+from .pyquest_operation import _OPERATIONS, _inverse_name
+from .utils import read_probabilities, read_state_vector, reorder_state
 
 
 class PyquestPure(PyquestDevice):
@@ -66,6 +55,7 @@ class PyquestPure(PyquestDevice):
         "BasisState",
         "QubitStateVector",
         "QubitUnitary",  # Theoretically supportable, but silently crashes due to C errors
+        "DiagonalQubitUnitary",
         "PauliX",
         "PauliY",
         "PauliZ",
@@ -86,25 +76,199 @@ class PyquestPure(PyquestDevice):
         "CRZ",
     }
 
-    def reset(self):
-        super().reset()
+    def __init__(self, wires, *, zero_copy_readback=False, **kwargs):
+        """
+        Args:
+            zero_copy_readback (bool): whether the state is read directly from the memory of
+                QuEST into an output array that is reused for every execution. The array
+                returned by :attr:`state` is then overwritten by the next execution.
+        """
+        super().__init__(wires, **kwargs)
+
+        self.zero_copy_readback = zero_copy_readback
+        self._state_buffer = None
+
+    @classmethod
+    def capabilities(cls):
+        capabilities = super().capabilities().copy()
+        capabilities.update(provides_jacobian=True, supports_inverse_operations=True)
+        return capabilities
 
+    def _worker_key(self):
+        return super()._worker_key() + (self.zero_copy_readback,)
+
+    def _make_worker(self):
+        worker = super()._make_worker()
+        worker._state_buffer = None
+
+        return worker
+
+    def _clear_information(self):
         self._state = None
         self._probs = None
 
-    def _qureg_context(self):
-        return QuregContext(self.num_wires)
+    def _qureg_context(self, num_qubits):
+        return self._pool.context(num_qubits)
+
+    @staticmethod
+    def _init_state_vector(qureg, state, reorder=True, pool=None):
+        if reorder:
+            state = reorder_state(state)
 
-    def _init_state_vector(self, state, context):
-        state = reorder_state(state)
         pqc.cheat.initStateFromAmps()(
-            context.qureg, reals=np.real(state), imags=np.imag(state),
+            qureg, reals=np.real(state), imags=np.imag(state),
         )
 
-    def _extract_information(self, context):
-        self._state = reorder_state(pqc.cheat.getStateVector()(context.qureg))
-        self._probs = np.abs(self._state) ** 2
+    def _extract_probabilities(self, qureg):
+        if self._state is not None:
+            return np.abs(self._state) ** 2
+
+        reorder = not self.native_layout
+
+        if self.zero_copy_readback:
+            probs = read_probabilities(qureg, reorder)
+
+            if probs is not None:
+                return probs
+
+        probs = np.abs(pqc.cheat.getStateVector()(qureg)) ** 2
+
+        return reorder_state(probs) if reorder else probs
+
+    def _read_state(self, qureg):
+        if self.zero_copy_readback:
+            size = 2 ** qureg.numQubitsRepresented
+
+            if self._state_buffer is None or len(self._state_buffer) != size:
+                self._state_buffer = np.empty(size, dtype=np.complex128)
+
+            state = read_state_vector(qureg, out=self._state_buffer, reorder=not self.native_layout)
+
+            if state is not None:
+                return state
+
+        state = pqc.cheat.getStateVector()(qureg)
+
+        return state if self.native_layout else reorder_state(state)
 
     @property
     def state(self):
+        if self._state is None and not self._reduced:
+            qureg = self._apply_rotations()
+
+            if qureg is not None:
+                self._state = self._read_state(qureg)
+
         return self._state
+
+    def _adjoint_steps(self, tape):
+        """Collect the operations the adjoint method walks through, or ``None`` if the tape is not supported.
+
+        Every step is a tuple ``(operation, column, generator, scale)``, where ``column`` is the
+        Jacobian column of the parameter of a trainable gate and ``None`` otherwise.
+        """
+        columns = {param: column for column, param in enumerate(sorted(tape.trainable_params))}
+        param = 0
+        steps = []
+
+        for operation in tape.operations:
+            params = range(param, param + operation.num_params)
+            param += operation.num_params
+            trainable = [p for p in params if p in columns]
+
+            if operation.name in ("BasisState", "QubitStateVector"):
+                if trainable:
+                    return None
+
+                continue
+
+            if _inverse_name(operation.name) not in _OPERATIONS:
+                return None
+
+            if not trainable:
+                steps.append((operation, None, None, None))
+                continue
+
+            generator = generator_terms(operation)
+
+            if trainable != [params[0]] or generator is None:
+                return None
+
+            scale = operation.generator[1] * (-1 if operation.inverse else 1)
+            steps.append((operation, columns[params[0]], generator, scale))
+
+        if any(p >= param for p in columns):
+            # trainable observable parameters
+            return None
+
+        # the gates before the first trainable one do not have to be undone
+        while steps and steps[0][1] is None:
+            steps.pop(0)
+
+        return steps
+
+    def adjoint_jacobian(self, tape):
+        """Compute the Jacobian of a tape with the adjoint method.
+
+        After a single forward pass the circuit is undone gate by gate with the inverse kernels,
+        and the derivatives are obtained from inner products with the observables applied to
+        the final state. Tapes that measure anything else than expectation values of Pauli
+        words and sums, or that contain gates without a known generator, are differentiated
+        with the parameter-shift rule instead.
+
+        Args:
+            tape (.JacobianTape): the tape to differentiate
+
+        Returns:
+            array[float]: the Jacobian of shape ``(len(tape.observables), len(tape.trainable_params))``
+        """
+        observables = [pauli_terms(m.obs) if m.return_type is Expectation else None for m in tape.measurements]
+        steps = self._adjoint_steps(tape) if self.analytic else None
+
+        if steps is None or any(terms is None for terms in observables):
+            # the tape is recorded anew, so that its output dimension is inferred from the measurements
+            with QubitParamShiftTape() as shift_tape:
+                for obj in tape.operations + tape.measurements:
+                    obj.queue()
+
+            shift_tape.trainable_params = tape.trainable_params
+
+            return shift_tape.jacobian(self, method="best")
+
+        jac = np.zeros((len(observables), len(tape.trainable_params)))
+
+        self.reset()
+        self.apply(tape.operations)
+
+        phi = self._qureg
+        lambdas = [self._pool.acquire(self.num_wires) for _ in observables]
+        mu = self._pool.acquire(self.num_wires)
+
+        try:
+            for lam, terms in zip(lambdas, observables):
+                pqc.ops.applyPauliSum()(phi, *pauli_codes(self._map_terms(terms), self.num_wires), lam)
+
+            for operation, column, generator, scale in reversed(steps):
+                if column is not None:
+                    # d<O>/dtheta = 2 Re <lambda| i scale G |phi> for U = exp(i scale theta G)
+                    pqc.ops.applyPauliSum()(phi, *pauli_codes(self._map_terms(generator), self.num_wires), mu)
+
+                    for row, lam in enumerate(lambdas):
+                        jac[row, column] = -2 * scale * pqc.cheat.calcInnerProduct()(lam, mu).imag
+
+                inverse = self._call(_inverse_name(operation.name))
+                wires, parameters = self._map_wires(operation.wires.labels), operation.parameters
+
+                for qureg in [phi] + lambdas:
+                    inverse(qureg, wires, parameters)
+        finally:
+            for qureg in lambdas + [mu]:
+                self._pool.release(qureg)
+
+            self.reset()
+
+        return jac
+
+    def jacobian(self, tape):
+        """Compute the Jacobian of a tape, see :meth:`adjoint_jacobian`."""
+        return self.adjoint_jacobian(tape)
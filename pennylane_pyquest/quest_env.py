@@ -0,0 +1,194 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+QuEST environment
+=================
+
+**Module name:** :mod:`pennylane_pyquest.quest_env`
+
+.. currentmodule:: pennylane_pyquest.quest_env
+
+A single QuEST environment that is shared by all devices of the process.
+
+Every user of the environment holds a reference obtained via :func:`acquire_env`
+and gives it back with :func:`release_env`. The environment is created on first use and
+destroyed once the last reference was released and no register is alive anymore, or at
+interpreter exit at the latest. All registers should be created and destroyed through
+this module so that the number of live registers can be reported.
+
+Functions
+---------
+
+.. autosummary::
+   acquire_env
+   release_env
+   create_qureg
+   destroy_qureg
+   num_references
+   num_live_quregs
+   set_num_threads
+
+Code details
+~~~~~~~~~~~~
+"""
+import atexit
+import ctypes
+import ctypes.util
+import functools
+import threading
+
+import pyquest_cffi as pqc
+
+_lock = threading.RLock()
+_env = None
+_num_references = 0
+_num_live_quregs = 0
+
+
+def acquire_env():
+    """Obtain a reference to the shared QuEST environment, creating it if necessary.
+
+    Returns:
+        QuESTEnv: the shared environment
+    """
+    global _env, _num_references
+
+    with _lock:
+        if _env is None:
+            _env = pqc.utils.createQuestEnv()()
+
+        _num_references += 1
+
+        return _env
+
+
+def release_env():
+    """Give back a reference obtained via :func:`acquire_env`."""
+    global _num_references
+
+    with _lock:
+        if _num_references == 0:
+            raise RuntimeError("The QuEST environment was released more often than it was acquired.")
+
+        _num_references -= 1
+        _destroy_if_unused()
+
+
+def create_qureg(wires, density=False):
+    """Create a register in the shared QuEST environment.
+
+    The caller has to hold a reference to the environment.
+
+    Args:
+        wires (int): the number of qubits of the register
+        density (bool): whether a density matrix register is created
+
+    Returns:
+        Qureg: the new register
+    """
+    global _num_live_quregs
+
+    with _lock:
+        if _env is None:
+            raise RuntimeError("The QuEST environment has to be acquired before creating registers.")
+
+        if density:
+            qureg = pqc.utils.createDensityQureg()(wires, env=_env)
+        else:
+            qureg = pqc.utils.createQureg()(wires, env=_env)
+
+        _num_live_quregs += 1
+
+        return qureg
+
+
+def destroy_qureg(qureg):
+    """Destroy a register created via :func:`create_qureg`.
+
+    Args:
+        qureg (Qureg): the register to destroy
+    """
+    global _num_live_quregs
+
+    with _lock:
+        # after the environment was torn down at exit the memory is reclaimed by the OS
+        if _env is not None:
+            pqc.utils.destroyQureg()(qureg, env=_env)
+
+        _num_live_quregs -= 1
+        _destroy_if_unused()
+
+
+def num_references():
+    """int: the number of references currently held to the shared environment"""
+    return _num_references
+
+
+def num_live_quregs():
+    """int: the number of registers that are currently alive"""
+    return _num_live_quregs
+
+
+def set_num_threads(num_threads):
+    """Set the number of OpenMP threads QuEST uses for the calls made from the calling thread.
+
+    The OpenMP runtime keeps the thread count per thread, so that every thread that calls into
+    QuEST can be given its share of the cores.
+
+    Args:
+        num_threads (int): the number of threads
+
+    Returns:
+        bool: whether an OpenMP runtime was found, QuEST is single-threaded otherwise
+    """
+    omp_set_num_threads = _omp_set_num_threads()
+
+    if omp_set_num_threads is None:
+        return False
+
+    omp_set_num_threads(int(num_threads))
+
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _omp_set_num_threads():
+    # the runtime is already loaded by QuEST, loading it again returns the same library
+    libraries = (ctypes.util.find_library(name) for name in ("gomp", "omp", "iomp5"))
+    names = [None] + [name for name in libraries if name is not None]
+
+    for name in names:
+        try:
+            return ctypes.CDLL(name).omp_set_num_threads
+        except (OSError, AttributeError, TypeError):
+            continue
+
+    return None
+
+
+def _destroy_if_unused():
+    if _num_references == 0 and _num_live_quregs == 0:
+        _destroy_env()
+
+
+def _destroy_env():
+    global _env
+
+    with _lock:
+        if _env is not None:
+            pqc.utils.destroyQuestEnv()(_env)
+            _env = None
+
+
+atexit.register(_destroy_env)
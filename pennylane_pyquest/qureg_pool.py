@@ -0,0 +1,164 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Qureg pool
+==========
+
+**Module name:** :mod:`pennylane_pyquest.qureg_pool`
+
+.. currentmodule:: pennylane_pyquest.qureg_pool
+
+A pool of QuEST registers that is owned by a device. Registers are handed out
+for an execution and returned afterwards, so that repeated executions reuse the
+already allocated memory instead of creating and destroying a register every time.
+
+Classes
+-------
+
+.. autosummary::
+   QuregPool
+   QuregContext
+
+Code details
+~~~~~~~~~~~~
+"""
+from . import quest_env
+
+
+class QuregContext:
+    """Context manager that borrows a register from a :class:`QuregPool`.
+
+    Args:
+        pool (QuregPool): the pool the register is borrowed from
+        wires (int): the number of qubits of the register
+        density (bool): whether a density matrix register is needed
+    """
+
+    def __init__(self, pool, wires, density=False):
+        self.pool = pool
+        self.wires = wires
+        self.density = density
+
+    def __enter__(self):
+        self.env = self.pool.env
+        self.qureg = self.pool.acquire(self.wires, density=self.density)
+
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.pool.release(self.qureg)
+
+
+class QuregPool:
+    """Pool of idle QuEST registers, keyed by the number of qubits and the register type.
+
+    Registers are created on demand by :meth:`acquire` and handed back with :meth:`release`.
+    At most ``max_size`` idle registers are kept alive, the least recently released ones
+    are destroyed first. All pools share the process-wide environment of
+    :mod:`~pennylane_pyquest.quest_env`.
+
+    Args:
+        max_size (int): the maximal number of idle registers kept by the pool
+    """
+
+    def __init__(self, max_size=2):
+        if max_size < 0:
+            raise ValueError("The maximal pool size must be non-negative, got {}.".format(max_size))
+
+        self.max_size = max_size
+        self.env = quest_env.acquire_env()
+        self._idle = []
+
+    @property
+    def closed(self):
+        """bool: whether the pool was closed"""
+        return self.env is None
+
+    @property
+    def num_idle(self):
+        """int: the number of idle registers currently held by the pool"""
+        return len(self._idle)
+
+    @staticmethod
+    def _key(qureg):
+        return qureg.numQubitsRepresented, bool(qureg.isDensityMatrix)
+
+    def acquire(self, wires, density=False):
+        """Borrow a register from the pool, creating it if no idle register fits.
+
+        The register content is not reset and has to be initialized by the caller.
+
+        Args:
+            wires (int): the number of qubits of the register
+            density (bool): whether a density matrix register is needed
+
+        Returns:
+            Qureg: the borrowed register
+        """
+        if self.closed:
+            raise RuntimeError("The qureg pool was already closed.")
+
+        key = (wires, density)
+        for idx in reversed(range(len(self._idle))):
+            if self._key(self._idle[idx]) == key:
+                return self._idle.pop(idx)
+
+        return quest_env.create_qureg(wires, density=density)
+
+    def release(self, qureg):
+        """Return a register to the pool.
+
+        Args:
+            qureg (Qureg): a register previously obtained via :meth:`acquire`
+        """
+        if self.closed:
+            quest_env.destroy_qureg(qureg)
+            return
+
+        self._idle.append(qureg)
+
+        while len(self._idle) > self.max_size:
+            quest_env.destroy_qureg(self._idle.pop(0))
+
+    def context(self, wires, density=False):
+        """Context manager that borrows a register for the duration of a ``with`` block.
+
+        Args:
+            wires (int): the number of qubits of the register
+            density (bool): whether a density matrix register is needed
+
+        Returns:
+            QuregContext: the context manager
+        """
+        return QuregContext(self, wires, density=density)
+
+    def close(self):
+        """Destroy all idle registers and give back the reference to the QuEST environment.
+
+        Registers that are still borrowed are destroyed when they are released.
+        """
+        if self.closed:
+            return
+
+        while self._idle:
+            quest_env.destroy_qureg(self._idle.pop())
+
+        self.env = None
+        quest_env.release_env()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.close()
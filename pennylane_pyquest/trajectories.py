@@ -0,0 +1,151 @@
+# Copyright 2020 Johannes Jakob Meyer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Quantum trajectories
+====================
+
+**Module name:** :mod:`pennylane_pyquest.trajectories`
+
+.. currentmodule:: pennylane_pyquest.trajectories
+
+Channels applied to state vector registers by sampling one of their Kraus operators. A
+channel :math:`\\rho \\mapsto \\sum_i K_i \\rho K_i^\\dagger` acting on the pure state
+:math:`|\\psi\\rangle` is replaced by :math:`K_i |\\psi\\rangle / \\sqrt{p_i}`, where the
+operator is drawn with probability :math:`p_i = \\| K_i |\\psi\\rangle \\|^2`. Averaged over
+many trajectories this reproduces the density matrix of the channel, while every trajectory
+only needs the memory of a state vector.
+
+Functions
+---------
+
+.. autosummary::
+   dephase
+   depolarise
+   damp
+   apply_kraus_map
+   trajectory_calls
+
+Code details
+~~~~~~~~~~~~
+"""
+import numpy as np
+import pyquest_cffi as pqc
+
+_PAULIS = (pqc.ops.pauliX(), pqc.ops.pauliY(), pqc.ops.pauliZ())
+_APPLY_MATRIX = pqc.ops.applyMatrix2()
+_PROB_OF_OUTCOME = pqc.cheat.calcProbOfOutcome()
+_EXPEC_PAULI_PROD = pqc.cheat.calcExpecPauliProd()
+
+
+def dephase(qureg, qubit, probability, rng):
+    """Apply a sample of the ``MixDephasing`` channel.
+
+    Args:
+        qureg (Qureg): a state vector register
+        qubit (int): the qubit the channel acts on
+        probability (float): the probability of a phase flip
+        rng (numpy.random.Generator): the source of randomness
+    """
+    if rng.random() < probability:
+        _PAULIS[2](qureg, qubit)
+
+
+def depolarise(qureg, qubit, probability, rng):
+    """Apply a sample of the ``MixDepolarising`` channel.
+
+    Args:
+        qureg (Qureg): a state vector register
+        qubit (int): the qubit the channel acts on
+        probability (float): the probability of one of the three Pauli errors
+        rng (numpy.random.Generator): the source of randomness
+    """
+    if rng.random() < probability:
+        _PAULIS[rng.integers(3)](qureg, qubit)
+
+
+def damp(qureg, qubit, probability, rng):
+    """Apply a sample of the ``MixDamping`` channel.
+
+    Args:
+        qureg (Qureg): a state vector register
+        qubit (int): the qubit the channel acts on
+        probability (float): the probability of a decay of the excited state
+        rng (numpy.random.Generator): the source of randomness
+    """
+    prob_excited = _PROB_OF_OUTCOME(qureg, qubit, 1)
+    prob_decay = probability * prob_excited
+
+    if rng.random() < prob_decay:
+        matrix = np.array([[0, 1 / np.sqrt(prob_excited)], [0, 0]])
+    else:
+        matrix = np.diag([1, np.sqrt(1 - probability)]) / np.sqrt(1 - prob_decay)
+
+    _APPLY_MATRIX(qureg, qubit, matrix)
+
+
+def apply_kraus_map(qureg, qubit, operators, rng, pool):
+    """Apply a sample of the ``MixKrausMap`` channel.
+
+    The probabilities of the operators are computed from the reduced density matrix of the
+    qubit, its coherences are only evaluated if one of the operators needs them.
+
+    Args:
+        qureg (Qureg): a state vector register
+        qubit (int): the qubit the channel acts on
+        operators (list[array[complex]]): the Kraus operators of the channel
+        rng (numpy.random.Generator): the source of randomness
+        pool (QuregPool): the pool the workspace register for the coherences is borrowed from
+    """
+    operators = [np.asarray(operator) for operator in operators]
+    products = [operator.conj().T @ operator for operator in operators]
+
+    prob_zero = _PROB_OF_OUTCOME(qureg, qubit, 0)
+    coherence = 0
+
+    if any(product[0, 1] != 0 for product in products):
+        with pool.context(qureg.numQubitsRepresented) as workspace:
+            x = _EXPEC_PAULI_PROD(qureg, [qubit], [1], workspace.qureg)
+            y = _EXPEC_PAULI_PROD(qureg, [qubit], [2], workspace.qureg)
+
+        coherence = (x + 1j * y) / 2
+
+    weights = np.array(
+        [
+            np.real(product[0, 0] * prob_zero + product[1, 1] * (1 - prob_zero))
+            + 2 * np.real(product[0, 1] * coherence)
+            for product in products
+        ]
+    )
+    weights = np.maximum(weights, 0)
+
+    idx = rng.choice(len(operators), p=weights / np.sum(weights))
+    _APPLY_MATRIX(qureg, qubit, operators[idx] / np.sqrt(weights[idx]))
+
+
+def trajectory_calls(rng, pool):
+    """Return the calls that apply samples of the channels, see :class:`~.PyquestProgram`.
+
+    Args:
+        rng (numpy.random.Generator): the source of randomness
+        pool (QuregPool): the pool workspace registers are borrowed from
+
+    Returns:
+        dict[str, callable]: the calls for the names of the channels
+    """
+    return {
+        "MixDephasing": lambda qureg, wires, parameters: dephase(qureg, wires[0], parameters[0], rng),
+        "MixDepolarising": lambda qureg, wires, parameters: depolarise(qureg, wires[0], parameters[0], rng),
+        "MixDamping": lambda qureg, wires, parameters: damp(qureg, wires[0], parameters[0], rng),
+        "MixKrausMap": lambda qureg, wires, parameters: apply_kraus_map(qureg, wires[0], parameters[0], rng, pool),
+    }
@@ -1,22 +1,134 @@
-import functools
 import math
+from collections import OrderedDict
 
 import numpy as np
+import pyquest_cffi as pqc
+from pyquest_cffi.questlib import ffi_quest, qreal, quest
+
+_QREAL_TO_DTYPE_DICT = {"float": np.float32, "double": np.float64, "longdouble": np.longdouble}
 
 
 def reverseBits(num, max_num):
-    total_len = len(bin(max_num)) - 2
-    num_bin = bin(num)[2:].zfill(total_len)
-    return int(num_bin[::-1], 2)
+    total_len = int(max_num).bit_length()
+    return int(bit_reversed(np.array([num]), total_len)[0])
+
+
+class ArrayCache:
+    """Least recently used cache of read-only arrays, bounded by the memory of the arrays.
+
+    Args:
+        max_bytes (int): the maximal number of bytes of all cached arrays, arrays larger than
+            this are returned without caching them
+    """
+
+    def __init__(self, max_bytes):
+        if max_bytes < 0:
+            raise ValueError("The maximal cache size must be non-negative, got {}.".format(max_bytes))
+
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._arrays = OrderedDict()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, key, factory):
+        """Return the cached array for a key, creating it with ``factory()`` if it is not cached.
+
+        Args:
+            key (Hashable): the key of the array
+            factory (callable): creates the array
+
+        Returns:
+            array: the read-only array
+        """
+        array = self._arrays.get(key)
+
+        if array is not None:
+            self._arrays.move_to_end(key)
+            return array
+
+        array = factory()
+        array.setflags(write=False)
+
+        if array.nbytes > self.max_bytes:
+            return array
+
+        self._arrays[key] = array
+        self.nbytes += array.nbytes
+
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._arrays.popitem(last=False)[1].nbytes
+
+        return array
+
+    def clear(self):
+        """Remove all arrays from the cache."""
+        self._arrays.clear()
+        self.nbytes = 0
+
+
+# 64 MiB hold the permutations of up to 24 qubits
+_BIT_REVERSAL_CACHE = ArrayCache(max_bytes=64 * 2 ** 20)
+
+
+def _index_dtype(num_bits):
+    return np.uint32 if num_bits <= 32 else np.uint64
+
+
+def bit_reversed(indices, num_bits):
+    """Reverse the lowest ``num_bits`` bits of an array of indices.
+
+    Args:
+        indices (array[int]): non-negative indices below ``2**num_bits``
+        num_bits (int): the number of bits that are reversed
+
+    Returns:
+        array[int]: the indices with reversed bits
+    """
+    dtype = _index_dtype(num_bits)
+    indices = np.asarray(indices, dtype=dtype)
+    reversed_indices = np.zeros_like(indices)
+
+    for bit in range(num_bits):
+        reversed_indices |= ((indices >> dtype(bit)) & dtype(1)) << dtype(num_bits - 1 - bit)
+
+    return reversed_indices
+
+
+def bit_reversal_permutation(num_bits):
+    """Return the indices ``0, ..., 2**num_bits - 1`` with reversed bits.
+
+    The permutation is built by doubling, the second half being the first one shifted by
+    the reversed highest bit, with ``num_bits`` vector operations. It is cached in a cache
+    bounded by memory and returned as a read-only array.
+
+    Args:
+        num_bits (int): the number of bits
+
+    Returns:
+        array[int]: the permutation as ``uint32`` or ``uint64`` array
+    """
+
+    def build():
+        dtype = _index_dtype(num_bits)
+        permutation = np.zeros(1, dtype=dtype)
+
+        for bit in range(num_bits):
+            permutation = np.concatenate([permutation, permutation + dtype(1 << (num_bits - 1 - bit))])
+
+        return permutation
+
+    return _BIT_REVERSAL_CACHE.get(num_bits, build)
 
 
-@functools.lru_cache()
 def reversed_indices(n):
-    indices = []
-    for i in range(n + 1):
-        indices.append(reverseBits(i, n))
+    num_bits = int(n).bit_length()
 
-    return np.array(indices)
+    if n + 1 == 2 ** num_bits:
+        return bit_reversal_permutation(num_bits)
+
+    return bit_reversed(np.arange(n + 1), num_bits)
 
 
 def reorder_state2(state):
@@ -44,3 +156,148 @@ def reorder_matrix(matrix):
     matrix = np.moveaxis(matrix, src + N, dest + N)
 
     return matrix.reshape((2 ** N, 2 ** N))
+
+
+def marginal_probabilities(qureg, qubits):
+    """Compute the probabilities of all outcomes of a subset of qubits in QuEST.
+
+    The first qubit corresponds to the least significant bit of the outcome index.
+
+    Args:
+        qureg (Qureg): a state vector or density matrix register
+        qubits (list[int]): the measured qubits
+
+    Returns:
+        array[float] or None: the probabilities or ``None`` if the QuEST library
+        does not provide the native routine
+    """
+    if hasattr(quest, "calcProbOfAllOutcomes"):
+        probs = ffi_quest.new("{}[{}]".format(qreal, 2 ** len(qubits)))
+        quest.calcProbOfAllOutcomes(probs, qureg, ffi_quest.new("int[]", list(qubits)), len(qubits))
+
+        return np.frombuffer(ffi_quest.buffer(probs), dtype=_QREAL_TO_DTYPE_DICT[qreal]).astype(float)
+
+    if len(qubits) == 1:
+        prob = pqc.cheat.calcProbOfOutcome()(qureg, qubits[0], 0)
+
+        return np.array([prob, 1 - prob])
+
+    return None
+
+
+def amplitude_views(qureg):
+    """Expose the real and imaginary parts of the amplitudes of a register as NumPy arrays.
+
+    The arrays are views on the memory of QuEST, no amplitude is copied. They are only valid
+    as long as the register is alive and change with every operation applied to it.
+
+    Args:
+        qureg (Qureg): a register that is not distributed over several processes
+
+    Returns:
+        tuple[array[float], array[float]] or None: the real and imaginary parts in QuEST order,
+        or ``None`` if the register is distributed
+    """
+    if qureg.numChunks != 1:
+        return None
+
+    dtype = np.dtype(_QREAL_TO_DTYPE_DICT[qreal])
+    size = qureg.numAmpsPerChunk * dtype.itemsize
+
+    real = np.frombuffer(ffi_quest.buffer(qureg.stateVec.real, size), dtype=dtype)
+    imag = np.frombuffer(ffi_quest.buffer(qureg.stateVec.imag, size), dtype=dtype)
+
+    return real, imag
+
+
+def density_diagonal(qureg):
+    """Read the diagonal of a density matrix register without reading the whole matrix.
+
+    QuEST stores the density matrix column by column, the diagonal is read with a strided
+    view on the real parts of the amplitudes.
+
+    Args:
+        qureg (Qureg): a density matrix register
+
+    Returns:
+        array[float] or None: the diagonal in QuEST order, or ``None`` if the register is
+        distributed
+    """
+    views = amplitude_views(qureg)
+
+    if views is None:
+        return None
+
+    dim = 2 ** qureg.numQubitsRepresented
+
+    return views[0][:: dim + 1].astype(float)
+
+
+def _wire_order(array, num_qubits, reorder):
+    array = array.reshape([2] * num_qubits)
+
+    if not reorder:
+        return array
+
+    # QuEST has the first qubit as least significant bit, PennyLane as the most significant one
+    return array.transpose(list(reversed(range(num_qubits))))
+
+
+def read_state_vector(qureg, out=None, reorder=True):
+    """Read the state vector of a register in the wire order of PennyLane.
+
+    The amplitudes are read through :func:`amplitude_views` and written directly into ``out``,
+    so that the only copy made is the one into the output array.
+
+    Args:
+        qureg (Qureg): a state vector register
+        out (array[complex]): an array of matching size the state is written to, a new array
+            is allocated if not given
+        reorder (bool): whether the order of the qubits is reversed, ``False`` if the wires
+            are already simulated with the first wire as most significant qubit
+
+    Returns:
+        array[complex] or None: the state vector, or ``None`` if the register is distributed
+    """
+    views = amplitude_views(qureg)
+
+    if views is None:
+        return None
+
+    num_qubits = qureg.numQubitsRepresented
+
+    if out is None:
+        out = np.empty(2 ** num_qubits, dtype=np.complex128)
+
+    target = out.reshape([2] * num_qubits)
+    np.copyto(target.real, _wire_order(views[0], num_qubits, reorder))
+    np.copyto(target.imag, _wire_order(views[1], num_qubits, reorder))
+
+    return out
+
+
+def read_probabilities(qureg, reorder=True):
+    """Read the probabilities of the basis states of a state vector register in the wire order of PennyLane.
+
+    The probabilities are computed from :func:`amplitude_views` without an intermediate copy
+    of the complex amplitudes.
+
+    Args:
+        qureg (Qureg): a state vector register
+        reorder (bool): see :func:`read_state_vector`
+
+    Returns:
+        array[float] or None: the probabilities, or ``None`` if the register is distributed
+    """
+    views = amplitude_views(qureg)
+
+    if views is None:
+        return None
+
+    num_qubits = qureg.numQubitsRepresented
+    probs = np.empty([2] * num_qubits)
+
+    np.square(_wire_order(views[0], num_qubits, reorder), out=probs)
+    probs += np.square(_wire_order(views[1], num_qubits, reorder))
+
+    return probs.ravel()
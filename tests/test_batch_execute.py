@@ -0,0 +1,247 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the batched and parallel execution of circuits"""
+import numpy as np
+import pennylane as qml
+import pytest
+
+import pennylane_pyquest
+from pennylane_pyquest import NoiseModel, PyquestMixed, PyquestPure, quest_env
+
+
+class TestBatchExecute:
+    """Tests for the batched execution of circuits"""
+
+    @staticmethod
+    def tape(x, y, measurement="expval"):
+        with qml.tape.QuantumTape() as tape:
+            qml.RX(x, wires=0)
+            qml.RY(y, wires=1)
+            qml.CNOT(wires=[0, 1])
+
+            if measurement == "expval":
+                qml.expval(qml.PauliZ(0) @ qml.PauliZ(1))
+                qml.var(qml.PauliX(1))
+            else:
+                qml.probs(wires=[0, 1])
+
+        return tape
+
+    def tapes(self):
+        return [
+            self.tape(0.1, 0.2),
+            self.tape(0.3, 0.4, "probs"),
+            self.tape(0.5, 0.6),
+            self.tape(0.7, 0.8, "probs"),
+            self.tape(0.9, 1.0),
+        ]
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_results(self, device):
+        """Test that the results agree with executing the circuits one by one"""
+        dev = device(wires=2)
+        res = dev.batch_execute(self.tapes())
+        expected = qml.QubitDevice.batch_execute(device(wires=2), self.tapes())
+
+        assert len(res) == len(expected)
+        for r, e in zip(res, expected):
+            assert np.allclose(r, e)
+
+    def test_validated_once_per_structure(self, monkeypatch):
+        """Test that circuits with the same structure are only validated once"""
+        dev = PyquestPure(wires=2)
+        calls = []
+        check_validity = qml.QubitDevice.check_validity
+
+        def record(self, queue, observables):
+            calls.append(len(queue))
+            check_validity(self, queue, observables)
+
+        monkeypatch.setattr(qml.QubitDevice, "check_validity", record)
+        dev.batch_execute(self.tapes())
+
+        assert len(calls) == 2
+        assert not dev._validated
+
+    def test_preallocated_results(self):
+        """Test that the results of a group share one array"""
+        dev = PyquestPure(wires=2)
+        res = dev.batch_execute(self.tapes())
+
+        assert res[0].base is res[2].base is res[4].base
+        assert res[1].base is res[3].base
+        assert res[0].base.shape == (3, 2)
+
+    def test_compiled_once(self):
+        """Test that circuits of the same structure share one program"""
+        dev = PyquestPure(wires=2)
+        dev.batch_execute([self.tape(0.1 * k, 0.2) for k in range(5)])
+
+        assert len(dev._programs) == 1
+
+    def test_invalid_operations(self):
+        """Test that unsupported operations are still rejected"""
+        with qml.tape.QuantumTape() as tape:
+            pennylane_pyquest.ops.MixDamping(0.1, wires=0)
+            qml.expval(qml.PauliZ(0))
+
+        with pytest.raises(qml.DeviceError, match="not supported"):
+            PyquestPure(wires=1).batch_execute([tape])
+
+    def test_parameter_shift(self):
+        """Test that parameter-shift gradients are computed with the batched execution"""
+        dev = PyquestPure(wires=2)
+
+        @qml.qnode(dev, diff_method="parameter-shift")
+        def circuit(x, y):
+            qml.RX(x, wires=0)
+            qml.RY(y, wires=1)
+            qml.CNOT(wires=[0, 1])
+            return qml.expval(qml.PauliZ(1))
+
+        grad = qml.grad(circuit)(qml.numpy.array(0.3), qml.numpy.array(0.4))
+
+        assert np.allclose(grad, [-np.sin(0.3) * np.cos(0.4), -np.cos(0.3) * np.sin(0.4)])
+
+
+class TestParallelExecution:
+    """Tests for the execution of batches on worker threads"""
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_results(self, device):
+        """Test that the results agree with the serial execution"""
+        tapes = TestBatchExecute().tapes()
+
+        with device(wires=2, max_workers=3) as dev:
+            res = dev.batch_execute(tapes)
+
+        expected = device(wires=2).batch_execute(tapes)
+
+        assert len(res) == len(expected)
+        for r, e in zip(res, expected):
+            assert np.allclose(r, e)
+
+    def test_noise_model(self):
+        """Test that the workers apply the noise model of the device"""
+        noise = NoiseModel().add("MixDepolarising", 0.1, gates=["CNOT"])
+        tapes = TestBatchExecute().tapes()
+
+        with PyquestMixed(wires=2, noise_model=noise, max_workers=2) as dev:
+            res = dev.batch_execute(tapes)
+
+        expected = PyquestMixed(wires=2, noise_model=noise).batch_execute(tapes)
+
+        for r, e in zip(res, expected):
+            assert np.allclose(r, e)
+
+    def test_workers_reused(self):
+        """Test that the worker copies are created once and do not share registers"""
+        dev = PyquestPure(wires=2, max_workers=2)
+        dev.batch_execute(TestBatchExecute().tapes())
+        workers = list(dev._workers._devices)
+        dev.batch_execute(TestBatchExecute().tapes())
+
+        assert dev.max_workers == 2
+        assert dev._workers._devices == workers
+        assert len({id(worker._pool) for worker in workers} | {id(dev._pool)}) == 3
+
+        dev.close()
+        assert all(worker._pool.closed for worker in workers)
+
+    def test_settings_changed(self):
+        """Test that the workers follow settings changed between two batches"""
+        tapes = []
+        for _ in range(4):
+            with qml.tape.QuantumTape() as tape:
+                qml.RX(np.pi / 2, wires=0)
+                qml.expval(qml.PauliZ(0))
+
+            tapes.append(tape)
+
+        dev = PyquestPure(wires=2, max_workers=2)
+
+        assert np.allclose([res[0] for res in dev.batch_execute(tapes)], 0)
+
+        dev.shots = 5
+        dev.analytic = False
+        res = dev.batch_execute(tapes)
+
+        # an odd number of samples of a balanced outcome never averages to zero
+        assert all(not np.isclose(r[0], 0) for r in res)
+        assert all(worker.shots == 5 and not worker.analytic for worker in dev._workers._devices)
+
+        dev.close()
+
+    def test_peephole_stats(self):
+        """Test that the gates removed on the workers are counted by the device"""
+        tapes = []
+        for k in range(4):
+            with qml.tape.QuantumTape() as tape:
+                qml.RX(0.1 * k, wires=0)
+                qml.Hadamard(wires=1)
+                qml.Hadamard(wires=1)
+                qml.expval(qml.PauliZ(0))
+
+            tapes.append(tape)
+
+        dev = PyquestPure(wires=2, peephole_optimization=True, max_workers=2)
+        serial_dev = PyquestPure(wires=2, peephole_optimization=True)
+
+        for _ in range(2):
+            dev.batch_execute(tapes)
+            serial_dev.batch_execute(tapes)
+
+        assert dev.peephole_stats == serial_dev.peephole_stats
+        assert dev.peephole_stats["cancelled"] == 16
+
+        dev.close()
+
+    def test_error_model_changed(self):
+        """Test that the workers apply an error model set between two batches"""
+        tapes = TestBatchExecute().tapes()
+        dev = PyquestMixed(wires=2, max_workers=2)
+        dev.batch_execute(tapes)
+
+        dev.error_model = lambda op: [pennylane_pyquest.ops.MixDepolarising(0.1, wires=op.wires[0], do_queue=False)]
+        res = dev.batch_execute(tapes)
+        expected = PyquestMixed(wires=2, error_model=dev.error_model).batch_execute(tapes)
+
+        for r, e in zip(res, expected):
+            assert np.allclose(r, e)
+
+        dev.close()
+
+    def test_parameter_shift(self):
+        """Test that parameter-shift gradients are computed on the workers"""
+        dev = PyquestMixed(wires=2, max_workers=2)
+
+        @qml.qnode(dev, diff_method="parameter-shift")
+        def circuit(x, y):
+            qml.RX(x, wires=0)
+            qml.RY(y, wires=1)
+            qml.CNOT(wires=[0, 1])
+            return qml.expval(qml.PauliZ(1))
+
+        grad = qml.grad(circuit)(qml.numpy.array(0.3), qml.numpy.array(0.4))
+
+        assert np.allclose(grad, [-np.sin(0.3) * np.cos(0.4), -np.cos(0.3) * np.sin(0.4)])
+
+    def test_invalid_max_workers(self):
+        """Test that a non-positive number of workers is rejected"""
+        with pytest.raises(ValueError, match="must be positive"):
+            PyquestPure(wires=2, max_workers=0)
+
+    def test_set_num_threads(self):
+        """Test that setting the number of OpenMP threads reports whether a runtime was found"""
+        assert quest_env.set_num_threads(1) in (True, False)
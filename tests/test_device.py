@@ -14,10 +14,12 @@
 """Tests for any plugin- or framework-specific behaviour of the plugin devices"""
 import numpy as np
 import pennylane as qml
+import pyquest_cffi as pqc
 import pytest
 
 import pennylane_pyquest
-from pennylane_pyquest import PyquestPure, PyquestMixed
+from pennylane_pyquest import NoiseModel, PyquestPure, PyquestMixed, utils
+from pennylane_pyquest.pyquest_operation import _OPERATIONS
 
 U = np.array(
     [
@@ -50,6 +52,7 @@ def simple_error_model(operation):
         
     return [pennylane_pyquest.ops.MixDephasing(0.03, wires=w) for w in operation.wires]
 
+
 class TestErrorModel:
 
     def test_error_model(self):
@@ -99,4 +102,451 @@ class TestErrorModel:
         print(node())
         print(err_node())
 
-        assert node() != err_node()
\ No newline at end of file
+        assert node() != err_node()
+
+    def test_error_model_cache(self):
+        """Test that the error model is only called once per distinct operation."""
+        calls = []
+
+        def error_model(operation):
+            calls.append(operation.name)
+            return simple_error_model(operation)
+
+        dev = PyquestMixed(wires=2, error_model=error_model, error_model_cache_size=4)
+        ops = [qml.Hadamard(0), qml.CNOT(wires=[0, 1]), qml.Hadamard(0), qml.RZ(0.5, wires=[1])]
+
+        res = dev._preprocess_operations(ops)
+        dev._preprocess_operations(ops)
+
+        assert calls == ["Hadamard", "CNOT", "RZ"]
+        assert [op.name for op in res] == [
+            "Hadamard", "MixDephasing", "CNOT", "MixDephasing", "MixDephasing",
+            "Hadamard", "MixDephasing", "RZ", "MixDephasing",
+        ]
+
+        dev._preprocess_operations([qml.RZ(0.6, wires=[1]), qml.RZ(0.5, wires=[0])])
+        assert calls[3:] == ["RZ", "RZ"]
+
+    def test_error_model_cache_bounded(self):
+        """Test that the least recently used error model outputs are evicted."""
+        calls = []
+
+        def error_model(operation):
+            calls.append(operation.parameters[0])
+            return []
+
+        dev = PyquestMixed(wires=1, error_model=error_model, error_model_cache_size=2)
+
+        dev._preprocess_operations([qml.RX(x, wires=0) for x in (0.1, 0.2, 0.3, 0.1)])
+
+        assert calls == [0.1, 0.2, 0.3, 0.1]
+        assert len(dev._error_model_cache) == 2
+
+    def test_error_model_cache_array_parameters(self):
+        """Test that operations with array parameters are cached by value."""
+        calls = []
+
+        def error_model(operation):
+            calls.append(operation.name)
+            return []
+
+        dev = PyquestMixed(wires=1, error_model=error_model, error_model_cache_size=2)
+        dev._preprocess_operations([qml.QubitUnitary(np.eye(2), wires=0), qml.QubitUnitary(np.eye(2), wires=0)])
+        dev._preprocess_operations([qml.QubitUnitary(np.diag([1, -1]), wires=0)])
+
+        assert calls == ["QubitUnitary", "QubitUnitary"]
+
+    def test_error_model_cache_cleared_on_new_model(self):
+        """Test that replacing the error model invalidates the cache."""
+        dev = PyquestMixed(wires=1, error_model=simple_error_model, error_model_cache_size=2)
+        dev._preprocess_operations([qml.Hadamard(0)])
+
+        dev.error_model = lambda op: []
+
+        assert len(dev._error_model_cache) == 0
+        assert [op.name for op in dev._preprocess_operations([qml.Hadamard(0)])] == ["Hadamard"]
+
+    def test_error_model_cache_invalid_size(self):
+        """Test that a negative cache size raises an error."""
+        with pytest.raises(ValueError, match="must be non-negative"):
+            PyquestMixed(wires=1, error_model=simple_error_model, error_model_cache_size=-1)
+
+
+class TestPureFallback:
+    """Tests for the simulation of noise-free circuits on state vector registers"""
+
+    @staticmethod
+    def circuit():
+        qml.Hadamard(0)
+        qml.RY(0.4, wires=1)
+        qml.CNOT(wires=[0, 1])
+        qml.CRX(0.3, wires=[1, 2])
+
+        return qml.expval(qml.PauliZ(0) @ qml.PauliX(1)), qml.var(qml.PauliY(2))
+
+    @pytest.mark.parametrize("options", [{}, {"native_layout": True}, {"light_cone": True}])
+    def test_same_results(self, options):
+        """Test that the results agree with the density matrix simulation"""
+        dev = PyquestMixed(wires=3, **options)
+        res = qml.QNode(self.circuit, dev)()
+        expected = qml.QNode(self.circuit, PyquestMixed(wires=3, pure_fallback=False, **options))()
+
+        assert not dev._qureg.isDensityMatrix
+        assert np.allclose(res, expected, atol=1e-12, rtol=0)
+
+    @pytest.mark.parametrize("native_layout", [False, True])
+    def test_density_matrix(self, native_layout):
+        """Test that the density matrix is formed from the state vector"""
+        ops = [qml.Hadamard(0), qml.RY(0.4, wires=1), qml.CNOT(wires=[0, 2])]
+        dev = PyquestMixed(wires=3, native_layout=native_layout)
+        dev.apply(ops)
+        expected = PyquestMixed(wires=3, native_layout=native_layout, pure_fallback=False)
+        expected.apply(ops)
+
+        assert np.allclose(dev.density_matrix, expected.density_matrix)
+        assert np.allclose(dev.probability(), expected.probability())
+
+    def test_empty_error_model(self):
+        """Test that an error model that adds no channels keeps the register pure"""
+        dev = PyquestMixed(wires=3, error_model=lambda op: [] if op.name != "CRX" else simple_error_model(op))
+
+        dev.apply([qml.Hadamard(0), qml.CNOT(wires=[0, 1])])
+        assert not dev._qureg.isDensityMatrix
+
+        dev.apply([qml.Hadamard(0), qml.CRX(0.2, wires=[0, 1])])
+        assert dev._qureg.isDensityMatrix
+
+    def test_channel(self):
+        """Test that circuits with channels are simulated on a density matrix"""
+        dev = PyquestMixed(wires=1)
+        dev.apply([qml.Hadamard(0), pennylane_pyquest.ops.MixDephasing(0.1, wires=0)])
+
+        assert dev._qureg.isDensityMatrix
+
+    def test_noise_model(self):
+        """Test that the noise model is also checked for the basis rotations"""
+        dev = PyquestMixed(wires=1, noise_model=NoiseModel().add("MixDamping", 0.1, gates=["Hadamard"]))
+
+        dev.apply([qml.RX(0.2, wires=0)])
+        assert not dev._qureg.isDensityMatrix
+
+        dev.apply([qml.RX(0.2, wires=0)], rotations=[qml.Hadamard(0)])
+        assert dev._qureg.isDensityMatrix
+
+
+class TestHybridExecution:
+    """Tests for the simulation of the noise-free prefix of a circuit on a state vector"""
+
+    ops = [
+        qml.Hadamard(0, do_queue=False),
+        qml.RY(0.4, wires=1, do_queue=False),
+        qml.CNOT(wires=[0, 1], do_queue=False),
+        qml.CRX(0.3, wires=[1, 2], do_queue=False),
+        pennylane_pyquest.ops.MixDamping(0.2, wires=0, do_queue=False),
+        qml.CNOT(wires=[0, 2], do_queue=False),
+        pennylane_pyquest.ops.MixDephasing(0.1, wires=2, do_queue=False),
+    ]
+
+    @pytest.mark.parametrize("native_layout", [False, True])
+    def test_density_matrix(self, native_layout):
+        """Test that the density matrix agrees with the simulation on a density matrix only"""
+        dev = PyquestMixed(wires=3, native_layout=native_layout)
+        dev.apply(self.ops)
+        expected = PyquestMixed(wires=3, native_layout=native_layout, hybrid_execution=False)
+        expected.apply(self.ops)
+
+        assert dev._qureg.isDensityMatrix
+        assert np.allclose(dev.density_matrix, expected.density_matrix)
+
+    def test_prefix_on_state_vector(self, monkeypatch):
+        """Test that only the gates after the first channel are applied to the density matrix"""
+        dev = PyquestMixed(wires=3)
+        runs = []
+        run_program = dev._run_program
+
+        def record(operations, qureg):
+            runs.append((len(operations), bool(qureg.isDensityMatrix)))
+            run_program(operations, qureg)
+
+        monkeypatch.setattr(dev, "_run_program", record)
+        dev.apply(self.ops)
+
+        assert runs == [(4, False), (3, True)]
+        assert [(q.numQubitsRepresented, bool(q.isDensityMatrix)) for q in dev._pool._idle] == [(3, False)]
+
+    def test_noisy_rotations(self):
+        """Test that the state is converted before noisy basis rotations"""
+        model = NoiseModel().add("MixDepolarising", 0.2, gates=["Hadamard"])
+        dev = PyquestMixed(wires=1, noise_model=model)
+        dev.apply([qml.RY(0.3, wires=0)], rotations=[qml.Hadamard(0)])
+        expected = PyquestMixed(wires=1, noise_model=model, hybrid_execution=False)
+        expected.apply([qml.RY(0.3, wires=0)], rotations=[qml.Hadamard(0)])
+
+        assert dev._qureg.isDensityMatrix
+        assert np.allclose(dev.probability(), expected.probability())
+
+    def test_channel_first(self):
+        """Test circuits that start with a channel"""
+        ops = [pennylane_pyquest.ops.MixDamping(0.2, wires=0), qml.Hadamard(0)]
+        dev = PyquestMixed(wires=1)
+        dev.apply(ops)
+        expected = PyquestMixed(wires=1, hybrid_execution=False)
+        expected.apply(ops)
+
+        assert np.allclose(dev.density_matrix, expected.density_matrix)
+
+
+class TestLazyExtraction:
+    """Tests that the state is only read back from QuEST when it is needed"""
+
+    def test_pure_probabilities_without_state(self):
+        """Test that probabilities do not materialize the state vector"""
+        dev = PyquestPure(wires=2)
+        dev.apply([qml.Hadamard(0), qml.CNOT(wires=[0, 1])])
+
+        assert dev._probs is None and dev._state is None
+        assert np.allclose(dev.probability(), [0.5, 0, 0, 0.5])
+        assert dev._state is None
+
+        assert np.allclose(dev.state, [1 / np.sqrt(2), 0, 0, 1 / np.sqrt(2)])
+
+    def test_mixed_native_expval_without_density_matrix(self):
+        """Test that a native expectation value does not read back the density matrix"""
+        dev = PyquestMixed(wires=2)
+        dev.apply([qml.RX(0.3, wires=0)])
+
+        assert np.allclose(dev.expval(qml.PauliZ(0)), np.cos(0.3))
+        assert dev._density_matrix is None
+
+    @pytest.mark.parametrize("native_marginals", [True, False])
+    @pytest.mark.parametrize("native_layout", [False, True])
+    def test_mixed_probabilities_without_density_matrix(self, monkeypatch, native_marginals, native_layout):
+        """Test that the probabilities of a density matrix only read its diagonal"""
+        ops = [qml.Hadamard(0), qml.RY(0.4, wires=2), qml.CNOT(wires=[0, 1]), pennylane_pyquest.MixDamping(0.3, wires=0)]
+        dev = PyquestMixed(wires=3, native_layout=native_layout)
+        dev.apply(ops)
+        expected = np.real(np.diag(dev.density_matrix))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("the density matrix was read")
+
+        if not native_marginals:
+            monkeypatch.setattr(pennylane_pyquest.pyquest_mixed, "marginal_probabilities", lambda *args: None)
+
+        dev.apply(ops)
+        monkeypatch.setattr(pqc.cheat, "getDensityMatrix", lambda: fail)
+
+        assert np.allclose(dev.probability(), expected)
+        assert dev._density_matrix is None
+
+    def test_apply_clears_information(self):
+        """Test that a new execution discards the information of the previous one"""
+        dev = PyquestPure(wires=1)
+        dev.apply([qml.PauliX(0)])
+        assert np.allclose(dev.probability(), [0, 1])
+
+        dev.apply([qml.Hadamard(0)])
+        assert np.allclose(dev.probability(), [0.5, 0.5])
+
+    def test_reset_releases_register(self):
+        """Test that a reset hands the live register back to the pool"""
+        dev = PyquestPure(wires=1)
+        dev.apply([qml.PauliX(0)])
+        dev.reset()
+
+        assert dev._qureg is None
+        assert dev.state is None
+        assert dev.probability() is None
+
+
+class TestMarginalProbabilities:
+    """Tests for the marginal probabilities computed by QuEST"""
+
+    ops = [qml.RX(0.4, wires=0), qml.RY(1.1, wires=1), qml.CNOT(wires=[1, 2]), qml.RX(-0.7, wires=2)]
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    @pytest.mark.parametrize("wires", [[0], [2, 0], [1, 2]])
+    def test_native_matches_full(self, device, wires):
+        """Test that the native marginal probabilities match the ones of the full distribution"""
+        dev = device(wires=3)
+        dev.apply(self.ops)
+
+        marginal = dev.probability(wires=wires)
+
+        # several wires are only computed natively with calcProbOfAllOutcomes, which QuEST 3.2 lacks
+        if len(wires) == 1 or hasattr(utils.quest, "calcProbOfAllOutcomes"):
+            assert dev._probs is None
+
+        assert np.allclose(marginal, dev.marginal_prob(dev.probability(), wires))
+
+    def test_single_wire_fallback(self, monkeypatch):
+        """Test that a single wire is computed natively if the library lacks calcProbOfAllOutcomes"""
+        monkeypatch.setattr(utils, "quest", object())
+
+        dev = PyquestPure(wires=2)
+        dev.apply([qml.RX(0.4, wires=1)])
+
+        assert np.allclose(dev.probability(wires=[1]), [np.cos(0.2) ** 2, np.sin(0.2) ** 2])
+        assert dev._probs is None
+        assert np.allclose(dev.probability(wires=[1, 0]), [np.cos(0.2) ** 2, 0, np.sin(0.2) ** 2, 0])
+
+
+class TestZeroCopyReadback:
+    """Tests for reading the state directly from the memory of QuEST"""
+
+    ops = [
+        qml.Hadamard(wires=0),
+        qml.RY(0.4, wires=1),
+        qml.CNOT(wires=[0, 2]),
+        qml.S(wires=2),
+        qml.RX(-1.1, wires=2),
+    ]
+
+    def test_views_share_memory(self):
+        """Test that the amplitude views follow the register without reading it again"""
+        dev = PyquestPure(wires=2)
+        dev.apply([])
+        real, imag = utils.amplitude_views(dev._qureg)
+
+        assert np.allclose(real, [1, 0, 0, 0]) and np.allclose(imag, 0)
+
+        _OPERATIONS["PauliX"].call(dev._qureg, (0,), [])
+
+        assert np.allclose(real, [0, 1, 0, 0])
+
+    def test_state_and_probabilities(self):
+        """Test that the state and probabilities agree with the copying readback"""
+        dev = PyquestPure(wires=3)
+        zero_copy_dev = PyquestPure(wires=3, zero_copy_readback=True)
+        dev.apply(self.ops)
+        zero_copy_dev.apply(self.ops)
+
+        assert np.allclose(zero_copy_dev.probability(), dev.probability())
+        assert zero_copy_dev._state is None
+        assert np.allclose(zero_copy_dev.state, dev.state)
+
+    def test_output_array_reused(self):
+        """Test that the state is written into the same output array for every execution"""
+        dev = PyquestPure(wires=3, zero_copy_readback=True)
+        dev.apply(self.ops)
+        state = dev.state
+
+        dev.apply([qml.PauliX(wires=1)])
+
+        assert dev.state is state
+        assert np.allclose(state, np.eye(8)[2])
+
+    def test_output_array(self):
+        """Test that the state is written into a given output array"""
+        dev = PyquestPure(wires=3)
+        dev.apply(self.ops)
+        out = np.zeros(8, dtype=complex)
+
+        assert utils.read_state_vector(dev._qureg, out=out) is out
+        assert np.allclose(out, dev.state)
+
+
+class TestNativeLayout:
+    """Tests that simulating wire w on qubit n - 1 - w gives the same results as reordering"""
+
+    @staticmethod
+    def operations(state_preparation):
+        rng = np.random.default_rng(1)
+        unitary = np.linalg.qr(rng.normal(size=(4, 4)) + 1j * rng.normal(size=(4, 4)))[0]
+
+        return [
+            state_preparation,
+            qml.RX(0.3, wires=0),
+            qml.QubitUnitary(unitary, wires=[2, 0]),
+            qml.DiagonalQubitUnitary(np.exp(1j * np.arange(8)), wires=[1, 3, 0]),
+            qml.PauliRot(0.4, "XYZ", wires=[3, 1, 2]),
+            qml.CRY(-0.8, wires=[3, 0]),
+            qml.MultiRZ(0.5, wires=[0, 1]),
+            pennylane_pyquest.ControlledUnitary(U, wires=[1, 2]),
+        ]
+
+    state_preparations = [
+        qml.BasisState(np.array([1, 0, 1, 1]), wires=range(4)),
+        qml.QubitStateVector(np.exp(1j * np.arange(16)) / 4, wires=range(4)),
+    ]
+
+    @pytest.mark.parametrize("state_preparation", state_preparations)
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    @pytest.mark.parametrize(
+        "options", [{}, {"max_fused_width": 3, "fuse_diagonal_gates": True}, {"zero_copy_readback": True}]
+    )
+    def test_equivalence(self, device, options, state_preparation):
+        """Test that the state, probabilities and expectation values agree"""
+        if device is PyquestMixed:
+            options = {key: value for key, value in options.items() if key != "zero_copy_readback"}
+
+        ops = self.operations(state_preparation)
+        obs = qml.PauliZ(0) @ qml.PauliX(2)
+        obs.return_type = qml.operation.Expectation
+        dev = device(wires=4)
+        native_dev = device(wires=4, native_layout=True, **options)
+        dev.apply(ops)
+        native_dev.apply(ops)
+
+        assert np.allclose(native_dev.expval(obs), dev.expval(obs))
+        assert np.allclose(native_dev.probability(wires=[2, 0]), dev.probability(wires=[2, 0]))
+        assert np.allclose(native_dev.probability(), dev.probability())
+        assert np.allclose(native_dev.state, dev.state)
+
+    def test_adjoint_jacobian(self):
+        """Test that the adjoint Jacobian agrees"""
+
+        def circuit(x, y):
+            qml.BasisState(np.array([1, 0, 1]), wires=range(3))
+            qml.RX(x, wires=0)
+            qml.QubitUnitary(U, wires=2)
+            qml.CRY(y, wires=[2, 1])
+            qml.PauliRot(x, "XY", wires=[1, 0])
+            return qml.expval(qml.PauliZ(0) @ qml.PauliY(1)), qml.expval(qml.PauliX(2))
+
+        jac = qml.jacobian(qml.QNode(circuit, PyquestPure(wires=3), diff_method="device"))(0.3, -0.4)
+        native_jac = qml.jacobian(qml.QNode(circuit, PyquestPure(wires=3, native_layout=True), diff_method="device"))(
+            0.3, -0.4
+        )
+
+        assert np.allclose(native_jac, jac)
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_read_only(self, device):
+        """Test that the layout can not be changed after the programs were compiled for it"""
+        dev = device(wires=2, native_layout=True)
+
+        with pytest.raises(AttributeError):
+            dev.native_layout = False
+
+        assert dev.native_layout
+
+
+class TestMixedStatePreparation:
+    """Tests for the preparation of pure states on the mixed device"""
+
+    state = np.array([1, 1j, -1, 2]) / np.sqrt(7)
+
+    @pytest.mark.parametrize("native_layout", [False, True])
+    def test_density_matrix(self, native_layout):
+        """Test that the prepared density matrix is the projector onto the state"""
+        dev = PyquestMixed(wires=2, native_layout=native_layout, pure_fallback=False, hybrid_execution=False)
+        dev.apply([qml.QubitStateVector(self.state, wires=[0, 1])])
+
+        assert np.allclose(dev.density_matrix, np.outer(self.state, self.state.conj()))
+
+    def test_workspace_returned(self):
+        """Test that the state vector register used for the preparation goes back to the pool"""
+        dev = PyquestMixed(wires=2, pure_fallback=False, hybrid_execution=False)
+        dev.apply([qml.QubitStateVector(self.state, wires=[0, 1])])
+
+        assert [(q.numQubitsRepresented, bool(q.isDensityMatrix)) for q in dev._pool._idle] == [(2, False)]
+
+    def test_without_pool(self):
+        """Test the preparation from the amplitudes of the density matrix"""
+        dev = PyquestMixed(wires=2, pure_fallback=False, hybrid_execution=False)
+        dev.apply([])
+        PyquestMixed._init_state_vector(dev._qureg, self.state)
+        dev._clear_information()
+
+        assert np.allclose(dev.density_matrix, np.outer(self.state, self.state.conj()))
@@ -17,6 +17,7 @@ import pennylane as qml
 import pytest
 
 from conftest import U2, A, U
+from pennylane_pyquest import PyquestMixed, quest_env
 
 np.random.seed(42)
 
@@ -269,3 +270,100 @@ class TestTensorExpval:
         )
 
         assert np.allclose(res, expected, **tol)
+
+
+@pytest.mark.parametrize("shots", [1000])
+class TestNativeExpval:
+    """Test that Pauli observables are evaluated natively on the unrotated register"""
+
+    ops = [
+        qml.RX(0.432, wires=[0]),
+        qml.RY(0.123, wires=[1]),
+        qml.RX(-0.543, wires=[2]),
+        qml.CNOT(wires=[0, 1]),
+        qml.CNOT(wires=[1, 2]),
+    ]
+
+    @staticmethod
+    def expected(dev, observable):
+        """Expectation value of an observable matrix, computed from the unrotated state"""
+        state = dev.state
+
+        if state.ndim == 1:
+            return np.vdot(state, observable @ state).real
+
+        return np.trace(observable @ state).real
+
+    def test_pauli_word_not_rotated(self, device, tol):
+        """Test that a Pauli word does not apply the basis rotations"""
+        dev = device(3)
+        obs = qml.PauliX(wires=[0]) @ qml.PauliY(wires=[2])
+        dev.apply(self.ops, obs.diagonalizing_gates())
+
+        res = dev.expval(obs)
+
+        assert not dev._rotated
+
+        dev.reset()
+        dev.apply(self.ops)
+
+        X, Y = qml.PauliX._matrix(), qml.PauliY._matrix()
+        assert np.allclose(res, self.expected(dev, np.kron(np.kron(X, np.eye(2)), Y)), **tol)
+
+    def test_rotated_after_non_pauli(self, device, tol):
+        """Test that a Pauli word is correct after another observable rotated the register"""
+        dev = device(3)
+        obs = qml.PauliZ(wires=[0]) @ qml.Hadamard(wires=[1]) @ qml.PauliY(wires=[2])
+        dev.apply(self.ops, obs.diagonalizing_gates())
+
+        observables = [obs, qml.PauliY(wires=[2])]
+        for o in observables:
+            o.return_type = qml.operation.Expectation
+
+        res = dev.statistics(observables)
+
+        dev.reset()
+        dev.apply(self.ops)
+        expected_y = self.expected(dev, np.kron(np.eye(4), qml.PauliY._matrix()))
+
+        assert np.allclose(res[1], expected_y, **tol)
+
+    def test_hamiltonian(self, device, tol):
+        """Test the expectation value and variance of a Hamiltonian of Pauli words"""
+        dev = device(3)
+        dev.apply(self.ops)
+
+        H = qml.Hamiltonian(
+            [0.5, -1.2, 0.3],
+            [qml.PauliX(0) @ qml.PauliZ(1), qml.PauliY(1) @ qml.PauliY(2), qml.PauliX(0)],
+        )
+        X, Y, Z, I = qml.PauliX._matrix(), qml.PauliY._matrix(), qml.PauliZ._matrix(), np.eye(2)
+        matrix = (
+            0.5 * np.kron(np.kron(X, Z), I) - 1.2 * np.kron(np.kron(I, Y), Y) + 0.3 * np.kron(np.kron(X, I), I)
+        )
+
+        mean = self.expected(dev, matrix)
+
+        assert np.allclose(dev.expval(H), mean, **tol)
+        assert np.allclose(dev.var(H), self.expected(dev, matrix @ matrix) - mean ** 2, **tol)
+
+    def test_workspace_not_kept(self, device):
+        """Test that the workspace register is destroyed and not kept idle in the pool"""
+        dev = device(3)
+        dev.apply(self.ops)
+        num_idle = dev._pool.num_idle
+        num_live_quregs = quest_env.num_live_quregs()
+
+        dev.expval(qml.Hamiltonian([0.5, -1.2], [qml.PauliX(0) @ qml.PauliZ(1), qml.PauliY(2)]))
+        dev.expval(qml.PauliX(0) @ qml.PauliY(2))
+
+        assert dev._pool.num_idle == num_idle
+        assert quest_env.num_live_quregs() == num_live_quregs
+
+    def test_error_model_not_native(self, tol):
+        """Test that observables are not evaluated natively if an error model acts on the rotations"""
+        dev = PyquestMixed(wires=1, error_model=lambda op: [])
+        dev.apply([qml.RY(0.3, wires=0)], qml.PauliX(0).diagonalizing_gates())
+
+        assert np.allclose(dev.expval(qml.PauliX(0)), np.sin(0.3), **tol)
+        assert dev._rotated
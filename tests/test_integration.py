@@ -117,3 +117,85 @@ class TestCompareDefaultQubit:
         comp_cost = lambda params: autograd.numpy.sum(comp_node(params)) - comp_node(params)[0] ** 2
 
         assert np.allclose(autograd.grad(cost)(params), autograd.grad(comp_cost)(params), **tol)
+
+
+class TestAdjointJacobian:
+    """Tests for the adjoint Jacobian of the pure state device"""
+
+    @staticmethod
+    def circuit(params):
+        qml.BasisState(np.array([1, 0, 0]), wires=[0, 1, 2])
+        qml.RX(params[0], wires=0)
+        qml.Hadamard(wires=1)
+        qml.CRY(params[1], wires=[1, 2])
+        qml.S(wires=0)
+        qml.PauliRot(params[2], "XYZ", wires=[0, 1, 2])
+        qml.PhaseShift(params[3], wires=1).inv()
+        qml.CNOT(wires=[2, 0])
+        qml.MultiRZ(params[4], wires=[0, 2])
+        qml.RY(params[5], wires=1)
+
+        return qml.expval(qml.PauliX(0)), qml.expval(qml.PauliZ(1) @ qml.PauliY(2))
+
+    def test_provides_jacobian(self):
+        """Test that the pure state device advertises its Jacobian"""
+        assert PyquestPure.capabilities()["provides_jacobian"]
+        assert not PyquestMixed.capabilities().get("provides_jacobian", False)
+
+    @pytest.mark.parametrize("params", np.random.uniform(0, 2 * np.pi, (3, 6)))
+    def test_compare_default_qubit(self, params):
+        """Test that the adjoint Jacobian matches the parameter-shift Jacobian of default.qubit"""
+        node = qml.QNode(self.circuit, PyquestPure(wires=3), diff_method="device")
+        comp_node = qml.QNode(self.circuit, qml.device("default.qubit", wires=3), diff_method="parameter-shift")
+
+        assert np.allclose(qml.jacobian(node)(params), qml.jacobian(comp_node)(params), atol=1e-8)
+
+    def test_adjoint_used(self, monkeypatch):
+        """Test that expectation values of Pauli words are not differentiated by parameter shifts"""
+        dev = PyquestPure(wires=3)
+        node = qml.QNode(self.circuit, dev, diff_method="device")
+        params = np.random.uniform(0, 2 * np.pi, 6)
+        node(params)
+
+        executions = dev.num_executions
+        qml.jacobian(node)(params)
+
+        # only the forward evaluation of the QNode itself
+        assert dev.num_executions == executions + 1
+
+    def test_parameter_shift_fallback(self):
+        """Test that unsupported measurements are differentiated with the parameter-shift rule"""
+        dev = PyquestPure(wires=1)
+
+        @qml.qnode(dev, diff_method="device")
+        def node(x):
+            qml.RX(x, wires=0)
+            return qml.var(qml.PauliZ(0))
+
+        assert np.allclose(qml.grad(node)(0.4), 2 * np.cos(0.4) * np.sin(0.4))
+
+    def test_parameter_shift_fallback_zero_derivative(self):
+        """Test that the fallback works if no parameter affects the measured observable"""
+        dev = PyquestPure(wires=2)
+
+        @qml.qnode(dev, diff_method="best")
+        def node(x):
+            qml.RX(x, wires=0)
+            return qml.var(qml.PauliZ(1))
+
+        assert np.allclose(qml.grad(node)(qml.numpy.array(0.4)), 0)
+
+    def test_parameter_shift_fallback_trainable_subset(self):
+        """Test that the fallback only differentiates the trainable parameters of all measurements"""
+
+        def circuit(x, y):
+            qml.RX(x, wires=0)
+            qml.RY(y, wires=1)
+            qml.CNOT(wires=[0, 1])
+            return qml.var(qml.PauliZ(0)), qml.var(qml.PauliX(1))
+
+        x, y = qml.numpy.array(0.4), qml.numpy.array(-0.7, requires_grad=False)
+        node = qml.QNode(circuit, PyquestPure(wires=2), diff_method="best")
+        comp_node = qml.QNode(circuit, qml.device("default.qubit", wires=2), diff_method="parameter-shift")
+
+        assert np.allclose(qml.jacobian(node)(x, y), qml.jacobian(comp_node)(x, y))
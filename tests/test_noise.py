@@ -0,0 +1,123 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the noise models of the mixed device"""
+import json
+import pickle
+
+import numpy as np
+import pennylane as qml
+import pytest
+
+from pennylane_pyquest import NoiseModel, PyquestMixed
+
+
+def noise_model():
+    return (
+        NoiseModel()
+        .add("MixDepolarising", 0.05, gates=["CNOT"])
+        .add("MixDephasing", 0.1, gates=["RX", "Hadamard"], wires=[0])
+        .add("MixDamping", 0.02, wires=[1, 2])
+        .add("MixKrausMap", [np.sqrt(0.9) * np.eye(2), np.sqrt(0.1) * np.diag([1, -1])], gates=["RY"])
+    )
+
+
+class TestNoiseModel:
+    """Tests for the declarative noise model"""
+
+    @staticmethod
+    def circuit():
+        qml.Hadamard(0)
+        qml.RX(0.3, wires=1)
+        qml.CNOT(wires=[0, 1])
+        qml.RY(0.7, wires=2)
+        qml.RX(-0.2, wires=0)
+        qml.CNOT(wires=[1, 2])
+        qml.PauliX(2)
+
+        return qml.probs(wires=[0, 1, 2])
+
+    def test_errors(self):
+        """Test that the rules are matched by gate name and wire"""
+        errors = noise_model().errors("CNOT", [0, 1])
+
+        assert [(channel, wire) for channel, _, wire in errors] == [
+            ("MixDepolarising", 0),
+            ("MixDepolarising", 1),
+            ("MixDamping", 1),
+        ]
+        assert [channel for channel, _, _ in noise_model().errors("RX.inv", [0])] == ["MixDephasing"]
+        assert noise_model().errors("MixDamping", [1]) == []
+
+    def test_unknown_channel(self):
+        """Test that only the supported channels are accepted"""
+        with pytest.raises(ValueError, match="Unknown noise channel"):
+            NoiseModel().add("MixTwoQubitDephasing", 0.1)
+
+    def test_serialization(self):
+        """Test that the model survives a JSON round trip"""
+        model = noise_model()
+        restored = NoiseModel.from_dict(json.loads(json.dumps(model.to_dict())))
+
+        assert restored == model
+        assert np.allclose(restored.rules[3].parameter, model.rules[3].parameter)
+
+    def test_pickle(self):
+        """Test that the model can be sent to other processes"""
+        assert pickle.loads(pickle.dumps(noise_model())) == noise_model()
+
+    @pytest.mark.parametrize("options", [{}, {"native_layout": True}, {"light_cone": True}])
+    def test_matches_error_model(self, options):
+        """Test that the compiled model simulates the same channels as the equivalent error model"""
+        model = noise_model()
+        dev = PyquestMixed(wires=3, noise_model=model, **options)
+        err_dev = PyquestMixed(wires=3, error_model=model.error_model, **options)
+
+        res = qml.QNode(self.circuit, dev)()
+        expected = qml.QNode(self.circuit, err_dev)()
+
+        assert np.allclose(res, expected)
+        assert not np.allclose(res, qml.QNode(self.circuit, PyquestMixed(wires=3))())
+
+    def test_expval_with_rotations(self):
+        """Test that the basis rotations are noisy as with an error model"""
+        model = noise_model()
+
+        def circuit():
+            qml.RY(0.4, wires=0)
+            qml.CNOT(wires=[0, 1])
+            return qml.expval(qml.PauliX(0) @ qml.PauliY(1))
+
+        dev = PyquestMixed(wires=2, noise_model=model)
+        err_dev = PyquestMixed(wires=2, error_model=model.error_model)
+
+        assert np.allclose(qml.QNode(circuit, dev)(), qml.QNode(circuit, err_dev)())
+
+    def test_compiled_once(self):
+        """Test that the noise is part of the cached program and not expanded per execution"""
+        dev = PyquestMixed(wires=3, noise_model=noise_model())
+        node = qml.QNode(self.circuit, dev)
+
+        node()
+        program = next(iter(dev._programs._programs.values()))
+        node()
+
+        assert len(dev._programs) == 1
+        assert next(iter(dev._programs._programs.values())) is program
+        # seven gates and thirteen channels
+        assert len(program.instructions) == 20
+
+    def test_rejects_passes(self):
+        """Test that a noise model can not be combined with circuit rewrites"""
+        with pytest.raises(ValueError, match="can not be combined"):
+            PyquestMixed(wires=2, noise_model=noise_model(), fuse_single_qubit_gates=True)
@@ -0,0 +1,396 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the passes that rewrite circuits before the simulation"""
+import numpy as np
+import pennylane as qml
+import pytest
+
+import pennylane_pyquest
+from pennylane_pyquest import PyquestMixed, PyquestPure
+from pennylane_pyquest.passes import BlockFusion, DiagonalFusion, PeepholeOptimizer, SingleQubitFusion, light_cone
+
+
+def assert_state_unchanged(device, ops, num_wires, **options):
+    """Assert that a device with the given options simulates the same state as a plain one"""
+    dev = device(wires=num_wires)
+    optimized_dev = device(wires=num_wires, **options)
+    dev.apply(ops)
+    optimized_dev.apply(ops)
+
+    assert np.allclose(dev.state, optimized_dev.state)
+
+    return optimized_dev
+
+
+class TestSingleQubitFusion:
+    """Tests for the fusion of single-qubit gates"""
+
+    def test_runs_fused(self):
+        """Test that runs of single-qubit gates are fused up to the next gate on their wire"""
+        ops = [
+            qml.RX(0.1, wires=0),
+            qml.Hadamard(wires=0),
+            qml.RZ(0.3, wires=1),
+            qml.CNOT(wires=[0, 2]),
+            qml.S(wires=0),
+            qml.PhaseShift(0.2, wires=1),
+        ]
+
+        fused = SingleQubitFusion()(ops)
+
+        assert [op.name for op in fused] == ["QubitUnitary", "CNOT", "QubitUnitary", "S"]
+        assert fused[0].wires.labels == (0,)
+        assert np.allclose(fused[0].parameters[0], ops[1].matrix @ ops[0].matrix)
+        assert fused[3] is ops[4]
+
+    def test_channels_not_fused(self):
+        """Test that channels interrupt a run and are kept"""
+        ops = [qml.RX(0.1, wires=0), pennylane_pyquest.MixDephasing(0.1, wires=0), qml.RY(0.2, wires=0)]
+
+        assert SingleQubitFusion()(ops) == ops
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_state_unchanged(self, device):
+        """Test that fusion does not change the simulated state"""
+        ops = [
+            qml.BasisState(np.array([1, 0]), wires=[0, 1]),
+            qml.RX(0.4, wires=0),
+            qml.RY(-1.2, wires=0),
+            qml.T(wires=1),
+            qml.Hadamard(wires=1),
+            qml.CZ(wires=[0, 1]),
+            qml.RZ(0.7, wires=1),
+            qml.PauliY(wires=1),
+        ]
+
+        fused_dev = assert_state_unchanged(device, ops, 2, fuse_single_qubit_gates=True)
+
+        assert len(fused_dev._programs.get(fused_dev._preprocess_operations(ops)).instructions) == 5
+
+
+class TestDiagonalFusion:
+    """Tests for the fusion of diagonal gates"""
+
+    def test_commuting_gates_fused(self):
+        """Test that diagonal gates are fused across non-diagonal gates on other wires"""
+        ops = [
+            qml.RZ(0.1, wires=0),
+            qml.Hadamard(wires=2),
+            qml.CZ(wires=[0, 1]),
+            qml.MultiRZ(0.3, wires=[1, 0]),
+            qml.RX(0.2, wires=1),
+            qml.T(wires=0),
+        ]
+
+        fused = DiagonalFusion()(ops)
+
+        assert [op.name for op in fused] == ["Hadamard", "DiagonalQubitUnitary", "RX", "T"]
+        assert fused[1].wires.labels == (1, 0)
+        expected = np.diag(qml.MultiRZ(0.3, wires=[1, 0]).matrix) * np.diag(qml.CZ(wires=[1, 0]).matrix)
+        expected = expected * np.kron([1, 1], np.diag(qml.RZ(0.1, wires=0).matrix))
+        assert np.allclose(fused[1].parameters[0], expected)
+        assert fused[3] is ops[5]
+
+    def test_block_not_moved_past_gates_on_new_wires(self):
+        """Test that a diagonal gate does not join a block that was passed by a gate on its wires"""
+        ops = [qml.RZ(0.1, wires=0), qml.Hadamard(wires=1), qml.CZ(wires=[0, 1]), qml.RZ(0.4, wires=0)]
+
+        fused = DiagonalFusion()(ops)
+
+        assert [op.name for op in fused] == ["Hadamard", "RZ", "DiagonalQubitUnitary"]
+
+    def test_max_width(self):
+        """Test that blocks are split at the maximal width"""
+        ops = [qml.CZ(wires=[0, 1]), qml.CZ(wires=[1, 2]), qml.RZ(0.2, wires=2)]
+
+        fused = DiagonalFusion(max_width=2)(ops)
+
+        assert [op.name for op in fused] == ["CZ", "DiagonalQubitUnitary"]
+        assert fused[1].wires.labels == (2, 1)
+
+    def test_invalid_max_width(self):
+        """Test that a non-positive maximal width is rejected"""
+        with pytest.raises(ValueError, match="must be positive"):
+            DiagonalFusion(max_width=0)
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_state_unchanged(self, device):
+        """Test that fusion does not change the simulated state"""
+        ops = [qml.Hadamard(wires=w) for w in range(6)]
+        ops += [qml.CZ(wires=[w, (w + 1) % 6]) for w in range(6)]
+        ops += [
+            qml.MultiRZ(0.3, wires=[0, 3, 5]),
+            pennylane_pyquest.ControlledPhaseShift(0.5, wires=[4, 2]),
+            qml.CRZ(-0.7, wires=[1, 4]),
+            qml.PhaseShift(0.2, wires=5),
+            qml.S(wires=2).inv(),
+            qml.RX(0.3, wires=3),
+            qml.RZ(1.1, wires=3),
+        ]
+
+        assert_state_unchanged(device, ops, 6, fuse_diagonal_gates=True)
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_width_limited(self, device):
+        """Test that fused diagonals are limited to the width that is applied as a dense matrix"""
+        ops = [qml.CZ(wires=[w, w + 1]) for w in range(7)]
+
+        fusion = next(p for p in device(wires=8, fuse_diagonal_gates=True)._passes if isinstance(p, DiagonalFusion))
+        fused = fusion(ops)
+
+        assert fusion.max_width == 4
+        assert all(len(op.wires) <= 4 for op in fused)
+
+
+class TestBlockFusion:
+    """Tests for the fusion of gates into blocks of a few wires"""
+
+    def test_pair_fused(self):
+        """Test that gates on the same pair of wires are fused into one unitary"""
+        ops = [
+            qml.RX(0.1, wires=0),
+            qml.RY(0.2, wires=1),
+            qml.CNOT(wires=[1, 0]),
+            qml.RZ(0.3, wires=0),
+            qml.CZ(wires=[0, 1]),
+        ]
+
+        fused = BlockFusion(max_width=2)(ops)
+
+        assert [op.name for op in fused] == ["QubitUnitary"]
+        assert fused[0].wires.labels == (0, 1)
+
+        expected = np.kron(np.eye(2), qml.RY(0.2, wires=1).matrix) @ np.kron(qml.RX(0.1, wires=0).matrix, np.eye(2))
+        cnot = np.array([[1, 0, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0], [0, 1, 0, 0]])
+        expected = cnot @ expected
+        expected = np.kron(qml.RZ(0.3, wires=0).matrix, np.eye(2)) @ expected
+        expected = np.diag([1, 1, 1, -1]) @ expected
+        assert np.allclose(fused[0].parameters[0], expected)
+
+    def test_blocks_closed_at_max_width(self):
+        """Test that a gate that would widen a block beyond the limit starts a new block"""
+        ops = [
+            qml.Hadamard(wires=0),
+            qml.CNOT(wires=[0, 1]),
+            qml.CNOT(wires=[1, 2]),
+            qml.RX(0.3, wires=2),
+            qml.RY(0.1, wires=3),
+        ]
+
+        fused = BlockFusion(max_width=2)(ops)
+
+        assert [op.name for op in fused] == ["QubitUnitary", "QubitUnitary", "RY"]
+        assert [op.wires.labels for op in fused] == [(0, 1), (1, 2), (3,)]
+        assert len(BlockFusion(max_width=3)(ops)) == 2
+
+    def test_channels_close_blocks(self):
+        """Test that operations without a matrix close the blocks on their wires"""
+        ops = [qml.RX(0.1, wires=0), pennylane_pyquest.MixDephasing(0.1, wires=0), qml.RY(0.2, wires=0)]
+
+        assert BlockFusion(max_width=2)(ops) == ops
+
+    def test_invalid_max_width(self):
+        """Test that a non-positive maximal width is rejected"""
+        with pytest.raises(ValueError, match="must be positive"):
+            BlockFusion(max_width=0)
+
+    @pytest.mark.parametrize("max_width", [2, 3, 4])
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_state_unchanged(self, device, max_width):
+        """Test that fusion does not change the simulated state"""
+        rng = np.random.default_rng(0)
+        ops = [qml.BasisState(np.array([1, 0, 1, 0]), wires=range(4))]
+
+        for layer in range(3):
+            for wire in range(4):
+                ops.append(qml.RY(rng.uniform(0, 2 * np.pi), wires=wire))
+                ops.append(qml.RZ(rng.uniform(0, 2 * np.pi), wires=wire))
+            for wire in range(layer % 2, 3, 2):
+                ops.append(qml.CNOT(wires=[wire + 1, wire]))
+                ops.append(qml.CRZ(0.4, wires=[wire, wire + 1]))
+
+        fused_dev = assert_state_unchanged(device, ops, 4, max_fused_width=max_width)
+
+        assert len(fused_dev._preprocess_operations(ops)) < len(ops)
+
+
+class TestPeepholeOptimizer:
+    """Tests for the peephole optimization"""
+
+    def test_self_inverse_pairs_cancelled(self):
+        """Test that self-inverse pairs cancel, also when they are nested"""
+        ops = [
+            qml.Hadamard(wires=0),
+            qml.CNOT(wires=[0, 1]),
+            qml.CNOT(wires=[0, 1]),
+            qml.Hadamard(wires=0),
+            qml.CZ(wires=[1, 2]),
+            qml.CZ(wires=[2, 1]),
+            qml.CNOT(wires=[1, 2]),
+            qml.CNOT(wires=[2, 1]),
+        ]
+        optimizer = PeepholeOptimizer()
+
+        assert optimizer(ops) == ops[6:]
+        assert optimizer.stats == {"cancelled": 6, "merged": 0, "dropped": 0}
+
+    def test_inverse_pairs_cancelled(self):
+        """Test that a gate followed by its inverse cancels"""
+        ops = [qml.S(wires=0), qml.S(wires=0).inv(), qml.T(wires=1), qml.S(wires=1).inv()]
+
+        assert PeepholeOptimizer()(ops) == ops[2:]
+
+    def test_gates_in_between_block_cancellation(self):
+        """Test that gates are only cancelled with their direct neighbour on all wires"""
+        ops = [qml.CNOT(wires=[0, 1]), qml.Hadamard(wires=1), qml.CNOT(wires=[0, 1]), qml.PauliX(wires=0)]
+
+        assert PeepholeOptimizer()(ops) == ops
+
+    def test_rotations_merged(self):
+        """Test that adjacent rotations of the same kind are merged and zero angles dropped"""
+        ops = [
+            qml.RZ(0.1, wires=0),
+            qml.RZ(0.2, wires=0).inv(),
+            qml.RX(0.0, wires=1),
+            qml.PauliRot(0.3, "XY", wires=[1, 2]),
+            qml.PauliRot(0.4, "XY", wires=[1, 2]),
+            qml.PauliRot(0.5, "YX", wires=[1, 2]),
+            qml.CRY(0.6, wires=[0, 3]),
+            qml.CRY(-0.6, wires=[0, 3]),
+        ]
+        optimizer = PeepholeOptimizer()
+        optimized = optimizer(ops)
+
+        assert [op.name for op in optimized] == ["RZ", "PauliRot", "PauliRot"]
+        assert np.isclose(optimized[0].parameters[0], -0.1)
+        assert np.isclose(optimized[1].parameters[0], 0.7)
+        assert optimized[2] is ops[5]
+        assert optimizer.stats == {"cancelled": 0, "merged": 3, "dropped": 2}
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_state_unchanged(self, device):
+        """Test that the optimization does not change the simulated state"""
+        ops = [
+            qml.BasisState(np.array([1, 0, 1]), wires=[0, 1, 2]),
+            qml.Hadamard(wires=0),
+            qml.RY(0.3, wires=1),
+            qml.RY(0.9, wires=1),
+            qml.CNOT(wires=[0, 2]),
+            qml.CNOT(wires=[0, 2]),
+            qml.T(wires=2),
+            qml.PhaseShift(0.0, wires=0),
+            qml.SWAP(wires=[1, 2]),
+            qml.SWAP(wires=[2, 1]),
+            qml.MultiRZ(0.4, wires=[0, 1]),
+            qml.MultiRZ(0.2, wires=[1, 0]),
+        ]
+
+        optimized_dev = assert_state_unchanged(device, ops, 3, peephole_optimization=True)
+
+        assert optimized_dev.peephole_stats == {"cancelled": 4, "merged": 2, "dropped": 1}
+        assert device(wires=3).peephole_stats == {"cancelled": 0, "merged": 0, "dropped": 0}
+
+
+class TestLightCone:
+    """Tests for the light-cone pruning"""
+
+    @staticmethod
+    def circuit(measurement):
+        def circuit(x):
+            qml.BasisState(np.array([1, 0, 1, 1, 0, 1]), wires=range(6))
+            qml.RX(x, wires=0)
+            qml.CNOT(wires=[1, 0])
+            qml.RY(0.3, wires=1)
+            qml.CNOT(wires=[2, 3])
+            qml.Hadamard(wires=4)
+            qml.CRZ(0.5, wires=[4, 5])
+            qml.CNOT(wires=[5, 3])
+            return measurement()
+
+        return circuit
+
+    @staticmethod
+    def expected(circuit):
+        return qml.QNode(circuit, qml.device("default.qubit", wires=6))(0.4)
+
+    def test_light_cone(self):
+        """Test that operations outside the light cone are dropped and basis states restricted"""
+        ops = [
+            qml.BasisState(np.array([1, 0, 1, 1]), wires=range(4)),
+            qml.RX(0.1, wires=0),
+            qml.CNOT(wires=[1, 0]),
+            qml.CNOT(wires=[2, 3]),
+            qml.Hadamard(wires=3),
+        ]
+
+        pruned = light_cone(ops, {0})
+
+        assert [op.name for op in pruned] == ["BasisState", "RX", "CNOT"]
+        assert pruned[0].wires.labels == (0, 1)
+        assert np.array_equal(pruned[0].parameters[0], [1, 0])
+        assert pruned[1:] == ops[1:3]
+        assert [op.name for op in light_cone(ops, {2})] == ["BasisState", "CNOT"]
+        assert light_cone(ops, {0, 3}) == ops
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    @pytest.mark.parametrize(
+        "measurement",
+        [
+            lambda: qml.expval(qml.PauliZ(0)),
+            lambda: qml.var(qml.PauliX(0) @ qml.PauliZ(1)),
+            lambda: qml.expval(qml.Hermitian(np.diag([1, 2, 3, 4]), wires=[1, 0])),
+            lambda: qml.probs(wires=[1, 0]),
+        ],
+    )
+    def test_results_unchanged(self, device, measurement):
+        """Test that only the light cone is simulated and the results are unchanged"""
+        circuit = self.circuit(measurement)
+        dev = device(wires=6, light_cone=True)
+
+        assert np.allclose(qml.QNode(circuit, dev)(0.4), self.expected(circuit))
+        assert dev._qureg.numQubitsRepresented == 2
+        assert dev.state is None
+
+    def test_state_not_pruned(self):
+        """Test that the whole circuit is simulated if the state is returned"""
+        dev = PyquestPure(wires=6, light_cone=True)
+        qml.QNode(self.circuit(lambda: qml.probs(wires=range(6))), dev)(0.4)
+
+        assert dev._qureg.numQubitsRepresented == 6
+
+    def test_sampling_keeps_register(self):
+        """Test that the register is not reduced in sampling mode but gates are still dropped"""
+        dev = PyquestPure(wires=6, shots=100, analytic=False, light_cone=True)
+        samples = qml.QNode(self.circuit(lambda: qml.sample(qml.PauliZ(2))), dev)(0.4)
+
+        assert dev._qureg.numQubitsRepresented == 6
+        assert np.all(samples == -1)
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_probability_without_native_marginals(self, device, monkeypatch):
+        """Test the marginal probabilities of the light cone if QuEST does not compute them"""
+        monkeypatch.setattr(pennylane_pyquest.pyquest_device, "marginal_probabilities", lambda *args: None)
+        circuit = self.circuit(lambda: qml.probs(wires=[1, 0]))
+        dev = device(wires=6, light_cone=True)
+
+        assert np.allclose(qml.QNode(circuit, dev)(0.4), self.expected(circuit))
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_native_layout(self, device):
+        """Test that a reduced register is laid out like the full one"""
+        circuit = self.circuit(lambda: qml.probs(wires=[1, 0]))
+        dev = device(wires=6, light_cone=True, native_layout=True)
+
+        assert np.allclose(qml.QNode(circuit, dev)(0.4), self.expected(circuit))
+        assert dev._qubit_map == {0: 1, 1: 0}
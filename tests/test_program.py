@@ -0,0 +1,90 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the dispatch of operations and the cache of compiled programs"""
+import numpy as np
+import pennylane as qml
+import pytest
+
+from pennylane_pyquest import PyquestMixed, PyquestPure
+from pennylane_pyquest.pyquest_operation import _OPERATIONS
+from pennylane_pyquest.pyquest_program import ProgramCache
+
+
+class TestDispatch:
+    """Tests for the table that dispatches operations to pyquest-cffi kernels"""
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_all_operations_dispatched(self, device):
+        """Test that every supported gate has a kernel in the dispatch table"""
+        special = {"BasisState", "QubitStateVector"}
+
+        assert device.operations - special <= set(_OPERATIONS)
+
+    def test_kernel_instantiated_once(self, monkeypatch):
+        """Test that applying a gate reuses the kernel of the dispatch table"""
+        calls = []
+        operation = _OPERATIONS["CRX"]
+        monkeypatch.setattr(operation, "call", lambda *args: calls.append(args))
+        kernel = operation.kernel
+
+        dev = PyquestPure(wires=2)
+        dev.apply([qml.CRX(0.3, wires=[1, 0]), qml.CRX(0.5, wires=[0, 1])])
+
+        assert operation.kernel is kernel
+        assert [(wires, params) for _, wires, params in calls] == [((1, 0), [0.3]), ((0, 1), [0.5])]
+
+
+class TestProgramCache:
+    """Tests for the cache of compiled circuits"""
+
+    def test_same_structure_reuses_program(self):
+        """Test that operations with the same names and wires share a program"""
+        cache = ProgramCache(max_size=2)
+
+        program = cache.get([qml.RX(0.1, wires=0), qml.CNOT(wires=[0, 1])])
+
+        assert cache.get([qml.RX(0.7, wires=0), qml.CNOT(wires=[0, 1])]) is program
+        assert cache.get([qml.RX(0.7, wires=1), qml.CNOT(wires=[0, 1])]) is not program
+        assert len(cache) == 2
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used program is evicted"""
+        cache = ProgramCache(max_size=2)
+        first = cache.get([qml.PauliX(0)])
+        cache.get([qml.PauliY(0)])
+        cache.get([qml.PauliX(0)])
+        cache.get([qml.PauliZ(0)])
+
+        assert len(cache) == 2
+        assert cache.get([qml.PauliX(0)]) is first
+
+    def test_disabled(self):
+        """Test that a cache of size zero does not store programs"""
+        cache = ProgramCache(max_size=0)
+        cache.get([qml.PauliX(0)])
+
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_parameters_rebound(self, device):
+        """Test that a cached program is executed with the new parameters"""
+        dev = device(wires=2)
+
+        for theta in [0.3, 1.2]:
+            dev.apply([qml.BasisState(np.array([0, 1]), wires=[0, 1]), qml.RX(theta, wires=0)])
+
+            expected = [0, np.cos(theta / 2) ** 2, 0, np.sin(theta / 2) ** 2]
+            assert np.allclose(dev.probability(), expected)
+
+        assert len(dev._programs) == 1
@@ -0,0 +1,116 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the pool of QuEST registers and the shared QuEST environment"""
+import pennylane as qml
+import pytest
+
+from pennylane_pyquest import PyquestMixed, PyquestPure, quest_env
+from pennylane_pyquest.qureg_pool import QuregPool
+
+
+class TestQuregPool:
+    """Tests for the reuse of QuEST registers across executions"""
+
+    def test_release_and_reacquire(self):
+        """Test that a released register is handed out again for the same key"""
+        with QuregPool(max_size=2) as pool:
+            qureg = pool.acquire(2)
+            pool.release(qureg)
+
+            assert pool.num_idle == 1
+            assert pool.acquire(2) is qureg
+            assert pool.num_idle == 0
+
+    def test_key_distinguishes_type_and_size(self):
+        """Test that registers of a different size or type are not handed out"""
+        with QuregPool(max_size=4) as pool:
+            qureg = pool.acquire(2)
+            pool.release(qureg)
+
+            density_qureg = pool.acquire(2, density=True)
+            larger_qureg = pool.acquire(3)
+
+            assert density_qureg is not qureg
+            assert density_qureg.isDensityMatrix
+            assert larger_qureg is not qureg
+            assert pool.num_idle == 1
+
+    def test_max_size(self):
+        """Test that the pool does not keep more idle registers than allowed"""
+        with QuregPool(max_size=1) as pool:
+            quregs = [pool.acquire(1), pool.acquire(2)]
+
+            for qureg in quregs:
+                pool.release(qureg)
+
+            assert pool.num_idle == 1
+            assert pool.acquire(2) is quregs[1]
+
+    def test_closed_pool(self):
+        """Test that a closed pool can not hand out registers"""
+        pool = QuregPool()
+        pool.release(pool.acquire(1))
+        pool.close()
+
+        assert pool.closed
+        assert pool.num_idle == 0
+
+        with pytest.raises(RuntimeError, match="already closed"):
+            pool.acquire(1)
+
+    @pytest.mark.parametrize("device", [PyquestPure, PyquestMixed])
+    def test_device_reuses_qureg(self, device):
+        """Test that consecutive executions of a device reuse one register"""
+        with device(wires=2, max_pool_size=1) as dev:
+            dev.apply([qml.Hadamard(0)])
+            qureg = dev._qureg
+            dev.reset()
+
+            assert dev._pool.num_idle == 1
+            assert dev._pool._idle[0] is qureg
+
+            dev.apply([qml.PauliX(1)])
+
+            assert dev._qureg is qureg
+
+        assert dev._pool.closed
+
+
+class TestSharedEnvironment:
+    """Tests for the process-wide QuEST environment"""
+
+    def test_pools_share_environment(self):
+        """Test that all pools use the same environment and hold a reference to it"""
+        num_references = quest_env.num_references()
+
+        with QuregPool() as pool1, QuregPool() as pool2:
+            assert pool1.env is pool2.env
+            assert quest_env.num_references() == num_references + 2
+
+        assert quest_env.num_references() == num_references
+
+    def test_live_quregs(self):
+        """Test that the number of live registers is reported"""
+        num_live_quregs = quest_env.num_live_quregs()
+
+        with QuregPool(max_size=1) as pool:
+            quregs = [pool.acquire(1), pool.acquire(1, density=True)]
+            assert quest_env.num_live_quregs() == num_live_quregs + 2
+
+            for qureg in quregs:
+                pool.release(qureg)
+
+            assert quest_env.num_live_quregs() == num_live_quregs + 1
+
+        assert quest_env.num_live_quregs() == num_live_quregs
@@ -0,0 +1,154 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the quantum trajectory mode of the mixed device"""
+import warnings
+
+import numpy as np
+import pennylane as qml
+import pyquest_cffi as pqc
+import pytest
+
+import pennylane_pyquest
+from pennylane_pyquest import NoiseModel, PyquestMixed, trajectories
+from pennylane_pyquest.qureg_pool import QuregPool
+
+
+class TestTrajectories:
+    """Tests for the simulation of channels by sampling quantum trajectories"""
+
+    @staticmethod
+    def circuit():
+        qml.RY(0.7, wires=0)
+        qml.RX(0.4, wires=1)
+        pennylane_pyquest.ops.MixDamping(0.3, wires=0)
+        qml.CNOT(wires=[0, 1])
+        qml.Hadamard(2)
+        pennylane_pyquest.ops.MixDepolarising(0.2, wires=1)
+        pennylane_pyquest.ops.MixKrausMap(
+            [np.sqrt(0.7) * np.eye(2), np.sqrt(0.3) * np.array([[1, 1], [1, -1]]) / np.sqrt(2)], wires=2
+        )
+        qml.CNOT(wires=[1, 2])
+        pennylane_pyquest.ops.MixDephasing(0.25, wires=2)
+
+        return qml.expval(qml.PauliZ(0)), qml.expval(qml.PauliZ(1) @ qml.PauliX(2)), qml.var(qml.PauliX(2))
+
+    @pytest.mark.parametrize("options", [{}, {"native_layout": True}])
+    def test_matches_density_matrix(self, options):
+        """Test that the averaged trajectories agree with the density matrix simulation"""
+        expected = qml.QNode(self.circuit, PyquestMixed(wires=3))()
+
+        dev = PyquestMixed(wires=3, trajectories=1000, seed=42, **options)
+        res = qml.QNode(self.circuit, dev)()
+
+        assert dev.standard_error.shape == res.shape
+        assert np.all(np.abs(res - expected) <= 5 * dev.standard_error + 1e-10)
+
+    def test_light_cone(self):
+        """Test that trajectories are simulated on the register of the light cone"""
+
+        def circuit():
+            qml.Hadamard(0)
+            qml.Hadamard(1)
+            pennylane_pyquest.ops.MixDamping(0.4, wires=1)
+            qml.CNOT(wires=[2, 3])
+            return qml.probs(wires=[1])
+
+        expected = qml.QNode(circuit, PyquestMixed(wires=4))()
+
+        dev = PyquestMixed(wires=4, trajectories=1000, seed=7, light_cone=True)
+        res = qml.QNode(circuit, dev)()
+
+        assert dev._qureg.numQubitsRepresented == 1
+        assert np.all(np.abs(res - expected) <= 5 * dev.standard_error + 1e-10)
+
+    def test_noise_model(self):
+        """Test that a noise model is sampled in trajectory mode"""
+        model = NoiseModel().add("MixDamping", 0.2).add("MixDepolarising", 0.1, gates=["CNOT"])
+
+        def circuit():
+            qml.PauliX(0)
+            qml.CNOT(wires=[0, 1])
+            return qml.probs(wires=[0, 1])
+
+        expected = qml.QNode(circuit, PyquestMixed(wires=2, noise_model=model))()
+
+        dev = PyquestMixed(wires=2, noise_model=model, trajectories=1000, seed=3)
+        res = qml.QNode(circuit, dev)()
+
+        assert np.all(np.abs(res - expected) <= 5 * dev.standard_error + 1e-10)
+
+    def test_state_vector_registers(self):
+        """Test that trajectories do not allocate density matrices"""
+        dev = PyquestMixed(wires=3, trajectories=5)
+        qml.QNode(self.circuit, dev)()
+
+        assert not dev._qureg.isDensityMatrix
+        assert dev.density_matrix is None
+
+    def test_seed(self):
+        """Test that the trajectories are reproducible"""
+        res = [qml.QNode(self.circuit, PyquestMixed(wires=3, trajectories=20, seed=11))() for _ in range(2)]
+
+        assert np.allclose(res[0], res[1])
+
+    def test_single_trajectory(self):
+        """Test that the standard error of a single trajectory is undefined"""
+        dev = PyquestMixed(wires=3, trajectories=1)
+        qml.QNode(self.circuit, dev)()
+
+        assert np.all(np.isnan(dev.standard_error))
+
+    def test_damping(self):
+        """Test that full damping always decays the excited state"""
+        rng = np.random.default_rng(0)
+
+        with QuregPool() as pool:
+            with pool.context(1) as context:
+                pqc.cheat.initClassicalState()(context.qureg, state=1)
+                trajectories.damp(context.qureg, 0, 1.0, rng)
+
+                assert np.allclose(pqc.cheat.getStateVector()(context.qureg), [1, 0])
+
+    def test_invalid_trajectories(self):
+        """Test that the number of trajectories has to be positive"""
+        with pytest.raises(ValueError, match="must be positive"):
+            PyquestMixed(wires=1, trajectories=0)
+
+    def test_read_only(self):
+        """Test that the number of trajectories can not be changed after the device was created"""
+        dev = PyquestMixed(wires=1)
+
+        with pytest.raises(AttributeError):
+            dev.trajectories = 20
+
+        assert dev.trajectories is None
+
+    def test_standard_error_of_mixed_shapes(self):
+        """Test that the standard errors of results of different shapes are kept apart"""
+        with qml.tape.QuantumTape() as tape:
+            qml.RX(0.3, wires=0)
+            pennylane_pyquest.ops.MixDepolarising(0.2, wires=0)
+            qml.expval(qml.PauliZ(0))
+            qml.probs(wires=[0, 1])
+
+        dev = PyquestMixed(wires=2, trajectories=10, seed=3)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            dev.execute(tape)
+
+        assert not [w for w in caught if w.filename.endswith("pyquest_mixed.py")]
+        assert dev.standard_error.dtype == object
+        assert np.shape(dev.standard_error[0]) == ()
+        assert np.shape(dev.standard_error[1]) == (4,)
@@ -0,0 +1,74 @@
+# Copyright 2018 Xanadu Quantum Technologies Inc.
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the utility functions of the plugin"""
+import numpy as np
+import pytest
+
+from pennylane_pyquest import utils
+
+
+class TestBitReversal:
+    """Tests for the vectorized bit reversal"""
+
+    @staticmethod
+    def legacy_reversed_indices(n):
+        total_len = len(bin(n)) - 2
+        return np.array([int(bin(i)[2:].zfill(total_len)[::-1], 2) for i in range(n + 1)])
+
+    @pytest.mark.parametrize("n", [0, 1, 2, 5, 7, 8, 255, 1023])
+    def test_reversed_indices(self, n):
+        """Test that the indices agree with the string based bit reversal"""
+        assert np.array_equal(utils.reversed_indices(n), self.legacy_reversed_indices(n))
+
+    def test_reverse_bits(self):
+        """Test the bit reversal of single numbers"""
+        assert utils.reverseBits(1, 7) == 4
+        assert utils.reverseBits(6, 15) == 6
+        assert utils.reverseBits(3, 8) == 12
+
+    def test_compact_dtype(self):
+        """Test that the permutation is stored as a compact read-only array"""
+        permutation = utils.bit_reversal_permutation(10)
+
+        assert permutation.dtype == np.uint32
+        assert not permutation.flags.writeable
+        assert utils.bit_reversed(np.array([1]), 40).dtype == np.uint64
+        assert utils.bit_reversed(np.array([1]), 40)[0] == 2 ** 39
+
+    @pytest.mark.parametrize("num_qubits", [1, 3, 6])
+    def test_reorder_state(self, num_qubits):
+        """Test that both reorderings agree"""
+        state = np.arange(2 ** num_qubits) + 1j
+
+        assert np.array_equal(utils.reorder_state2(state), utils.reorder_state(state))
+
+    def test_cache_bounded(self):
+        """Test that the cache evicts the least recently used arrays to stay within its memory"""
+        cache = utils.ArrayCache(max_bytes=100)
+
+        cache.get("a", lambda: np.zeros(5))
+        cache.get("b", lambda: np.zeros(5))
+        cache.get("a", lambda: None)
+        cache.get("c", lambda: np.zeros(5))
+
+        assert len(cache) == 2 and cache.nbytes == 80
+        assert cache.get("b", lambda: np.ones(5))[0] == 1
+
+        assert cache.get("d", lambda: np.zeros(20)).nbytes == 160
+        assert len(cache) == 2
+
+    def test_invalid_cache_size(self):
+        """Test that a negative cache size is rejected"""
+        with pytest.raises(ValueError, match="must be non-negative"):
+            utils.ArrayCache(max_bytes=-1)